@@ -0,0 +1,74 @@
+import random
+import sys
+import time
+from rapidfuzz import fuzz
+from fuzzy_index import FuzzyIndex, TrieFuzzyIndex, score
+
+# Compares the fuzzy engines against the original linear fuzz.ratio / fuzz.partial_ratio scan.
+# Usage: python benchmark_fuzzy.py WORD_LIST [SAMPLE_SIZE]
+# WORD_LIST has one banned word per line, e.g. an export of the banned_words table, so
+# results are reproducible and the benchmark never touches the live database.
+
+CLEAN_WORDS = ["hello", "friend", "good", "game", "gg", "lol", "nice", "team", "push", "mid",
+               "classic", "assassin", "pass", "night", "thanks", "wp", "again", "ready", "heal", "noob"]
+
+
+def linear_scan(token: str, banned_words: list) -> bool:
+    # The acceptance rule is_similar used before the indexes existed
+    return any(score(fuzz.ratio, token, banned_word) >= 85 or score(fuzz.partial_ratio, token, banned_word) >= 90
+               for banned_word in banned_words)
+
+
+def mutate(word: str) -> str:
+    # One random typo, the kind of bypass the fuzzy stage is there to catch
+    chars = list(word)
+    position = random.randrange(len(chars))
+    operation = random.choice(["insert", "delete", "substitute", "swap"])
+    if operation == "insert":
+        chars.insert(position, random.choice("abcdefghijklmnopqrstuvwxyz"))
+    elif operation == "delete" and len(chars) > 1:
+        del chars[position]
+    elif operation == "substitute":
+        chars[position] = random.choice("abcdefghijklmnopqrstuvwxyz")
+    elif position + 1 < len(chars):
+        chars[position], chars[position + 1] = chars[position + 1], chars[position]
+    return "".join(chars)
+
+
+def load_words(path: str) -> list:
+    with open(path, encoding="utf-8") as word_list:
+        return sorted({line.strip().lower() for line in word_list if line.strip()})
+
+
+def run_benchmark(banned_words: list, sample_size: int = 300, seed: int = 42):
+    random.seed(seed)
+    tokens = [mutate(word) for word in random.sample(banned_words, min(sample_size, len(banned_words)))]
+    tokens += CLEAN_WORDS
+
+    start = time.perf_counter()
+    expected = [linear_scan(token, banned_words) for token in tokens]
+    baseline_time = time.perf_counter() - start
+    print(f"{'linear scan':<12} {baseline_time / len(tokens) * 1000:8.3f} ms/token  flagged {sum(expected)}/{len(tokens)}")
+
+    engines = [
+        ("index", FuzzyIndex(banned_words)),
+        ("trie k=1", TrieFuzzyIndex(banned_words, max_edits=1)),
+        ("trie k=2", TrieFuzzyIndex(banned_words, max_edits=2)),
+    ]
+    for name, engine in engines:
+        start = time.perf_counter()
+        flagged = [engine.best_match(token) is not None for token in tokens]
+        elapsed = time.perf_counter() - start
+
+        # Agreement with the linear scan: matches it missed and matches it did not make
+        missed = sum(1 for want, got in zip(expected, flagged) if want and not got)
+        extra = sum(1 for want, got in zip(expected, flagged) if got and not want)
+        print(f"{name:<12} {elapsed / len(tokens) * 1000:8.3f} ms/token  flagged {sum(flagged)}/{len(tokens)}"
+              f"  missed {missed}  extra {extra}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python benchmark_fuzzy.py WORD_LIST [SAMPLE_SIZE]")
+        sys.exit(1)
+    run_benchmark(load_words(sys.argv[1]), *[int(argument) for argument in sys.argv[2:]])
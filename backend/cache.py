@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the estimated memory of
+    its entries rather than their count. on_evict, if given, is called with
+    the key and value of every entry evicted or popped, outside the lock.
+    """
+
+    def __init__(self, max_bytes: int, on_evict=None):
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+        self.total_bytes = 0
+        self.entries = OrderedDict()  # key -> (value, size)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, size: int):
+        evicted = []
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            # Evict the least recently used entries, but always keep the newest one
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                evicted_key, (evicted_value, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                evicted.append((evicted_key, evicted_value))
+        if self.on_evict:
+            for evicted_key, evicted_value in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[1]
+        if entry is not None and self.on_evict:
+            self.on_evict(key, entry[0])
+
+    def keys(self) -> list:
+        with self.lock:
+            return list(self.entries)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class TTLSnapshot:
+    """
+    In-memory snapshot of a value loaded from the database. Reads are served
+    from memory; once the snapshot is older than ttl it is reloaded in a
+    background thread and swapped in atomically. A read never sees data
+    older than max_staleness: past that it reloads before returning, and
+    fails if the reload does. One load runs at a time, and readers waiting
+    on it get its outcome instead of loading again.
+    """
+
+    def __init__(self, loader, ttl: float, max_staleness: float, version_source=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        # Optional callable; when its value changes the snapshot reloads before the next read
+        self.version_source = version_source
+        self.state = None  # (value, version, loaded_at, source_version), replaced as a whole
+        self.loads = 0  # Finished load attempts, to tell whether one finished while waiting for the lock
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.load_lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns (value, version). The version only changes when the value does.
+        """
+        loads = self.loads
+        state = self.state
+        source_version = self.version_source() if self.version_source else None
+        if state is None or state[3] != source_version or time.monotonic() - state[2] > self.max_staleness:
+            state = self.refresh(loads)
+        elif time.monotonic() - state[2] > self.ttl:
+            self._refresh_in_background()
+        return state[0], state[1]
+
+    def refresh(self, loads: int = None):
+        """
+        Loads the value and swaps it in, unless a load finished after the
+        caller saw loads. When the load fails the previous snapshot is kept
+        with its original load time, so it still expires.
+        """
+        if loads is None:
+            loads = self.loads
+        with self.load_lock:
+            source_version = self.version_source() if self.version_source else None
+            previous = self.state
+            if self.loads != loads and (previous is None or previous[3] == source_version):
+                # Another thread loaded while this one waited; share its outcome
+                return self.usable_state()
+            try:
+                value = self.loader()
+            except Exception as e:
+                self.loads += 1
+                print(f"Failed to refresh snapshot: {e}")
+                return self.usable_state(e)
+
+            if previous is None:
+                version = 1
+            elif value == previous[0]:
+                version, value = previous[1], previous[0]
+            else:
+                version = previous[1] + 1
+            self.state = (value, version, time.monotonic(), source_version)
+            self.loads += 1
+            return self.state
+
+    def usable_state(self, error: Exception = None):
+        """
+        The current snapshot, unless there is none or it is older than max_staleness.
+        """
+        state = self.state
+        if state is None or time.monotonic() - state[2] > self.max_staleness:
+            raise RuntimeError(f"No snapshot loaded in the last {self.max_staleness:g}s") from error
+        return state
+
+    def _refresh_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Failed to refresh snapshot: {e}")
+            finally:
+                self.refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+class TTLCache:
+    """
+    Thread-safe cache of loaded values with a time-to-live. Falsy results
+    (e.g. an unknown key) are cached too, for negative_ttl, and concurrent
+    misses for the same key share a single load.
+    """
+
+    def __init__(self, ttl: float, negative_ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # key -> (value, expires_at)
+        self.in_flight = {}  # key -> [done event, value, error]
+        self.lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, calling loader(key) on a miss.
+        Threads that miss while a load is running wait for its result.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                return entry[0]
+            flight = self.in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.in_flight[key] = [threading.Event(), None, None]
+
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
+
+        try:
+            value = loader(key)
+            ttl = self.ttl if value else self.negative_ttl
+            with self.lock:
+                self.entries[key] = (value, time.monotonic() + ttl)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+            flight[1] = value
+            return value
+        except Exception as e:
+            flight[2] = e
+            raise
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+            flight[0].set()
+
+    def invalidate(self, predicate):
+        """
+        Drops every cached entry whose value matches the predicate.
+        """
+        with self.lock:
+            for key in [key for key, (value, _) in self.entries.items() if predicate(value)]:
+                del self.entries[key]
+
+
+class ListVersions:
+    """
+    Version counters for the banned word lists. Writes in database.py bump
+    them so cached compiled lists are rebuilt on the next request.
+    """
+
+    def __init__(self):
+        self.global_version = 0
+        self.company_versions = {}
+        self.lock = threading.Lock()
+
+    def bump_global(self):
+        with self.lock:
+            self.global_version += 1
+
+    def bump_company(self, company_id):
+        with self.lock:
+            self.company_versions[company_id] = self.company_versions.get(company_id, 0) + 1
+
+    def company_version(self, company_id) -> int:
+        return self.company_versions.get(company_id, 0)
+
+
+list_versions = ListVersions()
+
+# Company settings by API key, shared by filter.py and main.py
+company_settings = TTLCache(
+    ttl=float(os.getenv("COMPANY_CACHE_TTL", "30")),
+    negative_ttl=float(os.getenv("COMPANY_CACHE_NEGATIVE_TTL", "10")),
+    max_entries=int(os.getenv("COMPANY_CACHE_MAX_ENTRIES", "100000")),
+)
+
+# Per-token results shared across requests: raw token -> normalized form and
+# severity, and (compiled list, normalized token) -> match verdict
+token_severities = LRUCache(int(os.getenv("TOKEN_CACHE_MB", "64")) * 1024 * 1024)
+token_verdicts = LRUCache(int(os.getenv("VERDICT_CACHE_MB", "64")) * 1024 * 1024)
+
+# Rough memory of one cached token entry: key, value tuple and OrderedDict slot
+TOKEN_ENTRY_BYTES = 200
@@ -0,0 +1,102 @@
+import unicodedata
+from unidecode import unidecode
+
+# Lookalike letters from other scripts, folded to the Latin letter they imitate
+CONFUSABLES = {
+    # Cyrillic
+    "а": "a", "в": "b", "е": "e", "ё": "e", "к": "k", "м": "m", "н": "h", "о": "o", "р": "p",
+    "с": "c", "т": "t", "у": "y", "х": "x", "ѕ": "s", "і": "i", "ї": "i", "ј": "j", "ԁ": "d",
+    "ԛ": "q", "ԝ": "w", "һ": "h", "ӏ": "l", "ɡ": "g",
+    "А": "A", "В": "B", "Е": "E", "Ё": "E", "К": "K", "М": "M", "Н": "H", "О": "O", "Р": "P",
+    "С": "C", "Т": "T", "У": "Y", "Х": "X", "Ѕ": "S", "І": "I", "Ї": "I", "Ј": "J", "Ԁ": "D",
+    "Ԛ": "Q", "Ԝ": "W", "Һ": "H", "Ӏ": "l",
+    # Greek
+    "α": "a", "β": "b", "γ": "y", "ε": "e", "ι": "i", "κ": "k", "ν": "v", "ο": "o", "ρ": "p",
+    "τ": "t", "υ": "u", "χ": "x", "ω": "w",
+    "Α": "A", "Β": "B", "Ε": "E", "Ζ": "Z", "Η": "H", "Ι": "I", "Κ": "K", "Μ": "M", "Ν": "N",
+    "Ο": "O", "Ρ": "P", "Τ": "T", "Υ": "Y", "Χ": "X",
+    # Latin letters that do not decompose
+    "ı": "i", "ȷ": "j", "ł": "l", "Ł": "L", "ø": "o", "Ø": "O", "đ": "d", "Đ": "D", "ħ": "h",
+}
+
+# Characters that render as nothing: zero-width spaces and joiners, soft hyphens,
+# bidi marks, word joiners, variation selectors and the byte order mark
+INVISIBLE = frozenset(
+    ["\u00ad", "\u034f", "\u061c", "\u115f", "\u1160", "\u17b4", "\u17b5", "\u180e", "\u3164", "\ufeff", "\uffa0"]
+    + [chr(code) for code in range(0x200b, 0x2010)]
+    + [chr(code) for code in range(0x202a, 0x202f)]
+    + [chr(code) for code in range(0x2060, 0x2070)]
+    + [chr(code) for code in range(0xfe00, 0xfe10)]
+)
+
+
+class CanonicalTable(dict):
+    """
+    Replacement for every non-ASCII character, filled in the first time a
+    character is seen, so the Unicode database is consulted once per
+    distinct character rather than once per occurrence.
+    """
+
+    def __missing__(self, char):
+        replacement = canonical_char(char)
+        self[char] = replacement
+        return replacement
+
+
+def canonical_char(char: str) -> str:
+    """
+    Folds one non-ASCII character: confusables to their Latin lookalike,
+    fullwidth and other compatibility forms to ASCII, accents dropped,
+    invisible characters removed. Characters of other scripts are kept.
+    """
+    if char in CONFUSABLES:
+        return CONFUSABLES[char]
+    if char in INVISIBLE or unicodedata.combining(char):
+        return ""
+    decomposed = "".join(part for part in unicodedata.normalize("NFKD", char) if not unicodedata.combining(part))
+    if decomposed.isascii() and decomposed and not decomposed.isspace():
+        return decomposed
+    if unicodedata.name(char, "").startswith("LATIN "):
+        # Latin letters with no decomposition (e.g. ß, æ)
+        transliterated = unidecode(char)
+        if transliterated.isascii() and transliterated.isalpha():
+            return transliterated
+    if char.isspace():
+        return " "
+    return char
+
+
+canonical_table = CanonicalTable()
+
+
+def canonicalize(text: str):
+    """
+    Folds lookalike, fullwidth, accented and invisible characters in one
+    pass. Returns (canonical text, offsets); offsets is None when every
+    character kept its position, which is always the case for ASCII text.
+    Otherwise offsets[i] is the (start, end) in text of canonical character
+    i, and one more entry, (len(text), len(text)), marks the end of the text.
+    """
+    if text.isascii():
+        return text, None
+    pieces = [char if char < "\x80" else canonical_table[char] for char in text]
+    canonical_text = "".join(pieces)
+    if all(len(piece) == 1 for piece in pieces):
+        return canonical_text, None
+    offsets = []
+    for position, piece in enumerate(pieces):
+        offsets.extend([(position, position + 1)] * len(piece))
+    offsets.append((len(text), len(text)))
+    return canonical_text, offsets
+
+
+def original_span(offsets, start: int, end: int):
+    """
+    Maps a (start, end) span of the canonical text back to the original text.
+    Characters removed inside the span (e.g. zero-width joiners) are covered
+    too, and so are the ones right after it (combining accents on its last
+    letter), up to the next character that was kept.
+    """
+    if offsets is None or start >= end:
+        return start, end
+    return offsets[start][0], max(offsets[end - 1][1], offsets[end][0])
@@ -0,0 +1,49 @@
+def merge_spans(spans: list) -> list:
+    """
+    Merges overlapping or touching (start, end) spans into sorted, disjoint spans.
+    """
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(span) for span in merged]
+
+
+def drop_covered(matches: list) -> list:
+    """
+    Drops every (start, end, word) match whose span lies within another
+    match's span; of matches with the same span the first one is kept.
+    The rest keep their order.
+    """
+    kept = set()
+    covered_to = -1
+    for index, (start, end, _) in sorted(enumerate(matches), key=lambda item: (item[1][0], -item[1][1], item[0])):
+        if end > covered_to:
+            kept.add(index)
+            covered_to = end
+    return [match for index, match in enumerate(matches) if index in kept]
+
+
+def apply_censor(text: str, spans: list, mask: str = "*") -> str:
+    """
+    Builds the censored text in one pass over the merged spans, masking
+    each censored character of the original text.
+    """
+    pieces = []
+    position = 0
+    for start, end in merge_spans(spans):
+        pieces.append(text[position:start])
+        pieces.append(mask * (end - start))
+        position = end
+    pieces.append(text[position:])
+    return "".join(pieces)
+
+
+def spans_to_json(matches: list) -> list:
+    """
+    Formats (start, end, word) matches for the API response, in text order.
+    """
+    return [{"start": start, "end": end, "word": word} for start, end, word in sorted(matches)]
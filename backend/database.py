@@ -2,6 +2,7 @@ from supabase import create_client
 import os
 from dotenv import load_dotenv
 import uuid
+from cache import list_versions, company_settings
 
 # Load .env file explicitly, pointing to the root directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '../.env'))
@@ -44,6 +45,7 @@ def insert_banned_word(word: str):
     
     # Check if the insertion was successful and provide feedback
     if response.data:
+        list_versions.bump_global()  # Compiled word lists are rebuilt on the next request
         print(f"Successfully inserted '{word}' into banned_words table.")
     else:
         print(f"Failed to insert '{word}': {response.data}")
@@ -75,10 +77,58 @@ def delete_banned_word(word: str):
     """
     response = supabase.table("banned_words").delete().eq("word", word).execute()
     if response.data:
+        list_versions.bump_global()
         print(f"Successfully deleted {word} from banned_words table.")
     else:
         print(f"Failed to delete {word}: {response.data}")
 
+# =======================
+# Interactions with allowed_words Table
+# =======================
+
+def insert_allowed_word(word: str):
+    """
+    Insert a word into the allowed_words table. Allowed words are never censored,
+    even when they contain a banned word (e.g. "classic", "scunthorpe").
+    """
+    if len(word) > 255:
+        print(f"Failed to insert '{word}': Word exceeds maximum length of 255 characters.")
+        return
+
+    existing_words = supabase.table("allowed_words").select("word").eq("word", word).execute()
+    if existing_words.data:
+        print(f"Failed to insert '{word}': Word already exists.")
+        return
+
+    response = supabase.table("allowed_words").insert({"word": word}).execute()
+    if response.data:
+        list_versions.bump_global()
+        print(f"Successfully inserted '{word}' into allowed_words table.")
+    else:
+        print(f"Failed to insert '{word}': {response.data}")
+
+def get_allowed_words():
+    """
+    Retrieve all allowed words from the allowed_words table.
+    """
+    response = supabase.table("allowed_words").select("*").execute()
+    if response.data:
+        return response.data
+    else:
+        print(f"No allowed words retrieved: {response.data}")
+        return []
+
+def delete_allowed_word(word: str):
+    """
+    Delete a word from the allowed_words table.
+    """
+    response = supabase.table("allowed_words").delete().eq("word", word).execute()
+    if response.data:
+        list_versions.bump_global()
+        print(f"Successfully deleted {word} from allowed_words table.")
+    else:
+        print(f"Failed to delete {word}: {response.data}")
+
 # =======================
 # Interactions with company_settings Table
 # =======================
@@ -99,15 +149,24 @@ def generate_api_key() -> str:
         if not existing_company.data:
             return new_api_key
 
-def insert_company(company_name: str, api_key: str, custom_banned_words: list):
+def insert_company(company_name: str, api_key: str, custom_banned_words: list, pipeline: str = None,
+                   custom_allowed_words: list = None, custom_patterns: list = None):
     """
     Insert a new company into the company_settings table.
+    The pipeline, allowed words and pattern rules are only written when set,
+    so databases without those columns (see the README) keep working.
     """
     data = {
         "company_name": company_name,
         "api_key": api_key,
         "custom_banned_words": custom_banned_words,
     }
+    if custom_allowed_words:
+        data["custom_allowed_words"] = custom_allowed_words
+    if custom_patterns:
+        data["custom_patterns"] = custom_patterns
+    if pipeline:
+        data["pipeline"] = pipeline
     response = supabase.table("company_settings").insert(data).execute()
     if response.data:
         print(f"Successfully inserted company {company_name}.")
@@ -145,16 +204,64 @@ def update_company_banned_words(company_id: int, custom_banned_words: list):
     }
     response = supabase.table("company_settings").update(data).eq("company_id", company_id).execute()
     if response.data:
+        list_versions.bump_company(company_id)
+        company_settings.invalidate(lambda company: company and company["company_id"] == company_id)
         print(f"Successfully updated banned words for company {company_id}.")
     else:
         print(f"Failed to update banned words for company {company_id}: {response.data}")
 
+def update_company_allowed_words(company_id: int, custom_allowed_words: list):
+    """
+    Update the custom allowed words list for a company in the company_settings table.
+    """
+    data = {
+        "custom_allowed_words": custom_allowed_words
+    }
+    response = supabase.table("company_settings").update(data).eq("company_id", company_id).execute()
+    if response.data:
+        list_versions.bump_company(company_id)
+        company_settings.invalidate(lambda company: company and company["company_id"] == company_id)
+        print(f"Successfully updated allowed words for company {company_id}.")
+    else:
+        print(f"Failed to update allowed words for company {company_id}: {response.data}")
+
+def update_company_patterns(company_id: int, custom_patterns: list):
+    """
+    Update the regex pattern rules for a company in the company_settings table.
+    """
+    data = {
+        "custom_patterns": custom_patterns
+    }
+    response = supabase.table("company_settings").update(data).eq("company_id", company_id).execute()
+    if response.data:
+        list_versions.bump_company(company_id)
+        company_settings.invalidate(lambda company: company and company["company_id"] == company_id)
+        print(f"Successfully updated pattern rules for company {company_id}.")
+    else:
+        print(f"Failed to update pattern rules for company {company_id}: {response.data}")
+
+def update_company_pipeline(company_id: int, pipeline: str):
+    """
+    Set the moderation pipeline order ("model_first", "lexical_first" or "message_level") for a company.
+    """
+    data = {
+        "pipeline": pipeline
+    }
+    response = supabase.table("company_settings").update(data).eq("company_id", company_id).execute()
+    if response.data:
+        company_settings.invalidate(lambda company: company and company["company_id"] == company_id)
+        print(f"Successfully updated pipeline for company {company_id}.")
+    else:
+        print(f"Failed to update pipeline for company {company_id}: {response.data}")
+
 def delete_company(company_id: int):
     """
     Delete a company from the company_settings table.
     """
     response = supabase.table("company_settings").delete().eq("company_id", company_id).execute()
     if response.data:
+        list_versions.bump_company(company_id)
+        company_settings.invalidate(lambda company: company and company["company_id"] == company_id)
         print(f"Successfully deleted company with ID {company_id}.")
     else:
         print(f"Failed to delete company with ID {company_id}: {response.data}")
@@ -1,8 +1,79 @@
+import os
 import re
-from unidecode import unidecode
-from fuzzywuzzy import fuzz
-from database import get_banned_words, insert_flagged_message, get_company_by_api_key
-from model2 import predict_severity
+import threading
+from collections import Counter
+from functools import lru_cache
+from database import get_banned_words, get_allowed_words, insert_flagged_message, get_company_by_api_key
+from model2 import normalize_many
+from fuzzy_index import FuzzyIndex
+from censor import apply_censor, drop_covered, spans_to_json
+from cache import LRUCache, TTLSnapshot, list_versions, company_settings, token_severities, TOKEN_ENTRY_BYTES
+from word_lists import CompiledWordList, TenantWordLists, make_fuzzy_index
+from severity_table import known_severities
+from message_model import score_message
+from canonicalize import canonicalize, original_span
+
+# Memory cap for compiled word lists kept by this worker
+MATCHER_CACHE_BYTES = int(os.getenv("MATCHER_CACHE_MB", "256")) * 1024 * 1024
+
+
+def forget_compiled_word_list(key: tuple, compiled):
+    """
+    Drops a scope's terms from the known severity table once no compiled list
+    of that scope is cached anymore, e.g. a deleted or idle company's.
+    """
+    if not any(cached_key[0] == key[0] for cached_key in compiled_word_lists.keys()):
+        known_severities.remove_source(key[0])
+
+
+compiled_word_lists = LRUCache(MATCHER_CACHE_BYTES, on_evict=forget_compiled_word_list)
+
+# How long the in-memory copy of the global banned_words table is served before a
+# background refresh, and the hard bound after which a request waits for fresh data
+GLOBAL_WORDS_TTL = float(os.getenv("GLOBAL_WORDS_TTL", "60"))
+GLOBAL_WORDS_MAX_STALENESS = float(os.getenv("GLOBAL_WORDS_MAX_STALENESS", "300"))
+
+
+def load_global_banned_words() -> frozenset:
+    """
+    Fetches the global banned_words table as a set of normalized words.
+    """
+    words = frozenset(entry["word"].lower() for entry in get_banned_words() if entry.get("word"))
+    if not words and global_banned_words.state is not None:
+        # get_banned_words returns [] on failure too; keep serving the last good list
+        raise RuntimeError("banned_words returned no rows")
+    return words
+
+
+global_banned_words = TTLSnapshot(load_global_banned_words, GLOBAL_WORDS_TTL, GLOBAL_WORDS_MAX_STALENESS,
+                                  version_source=lambda: list_versions.global_version)
+
+
+def load_global_allowed_words() -> frozenset:
+    """
+    Fetches the global allowed_words table as a set of normalized words.
+    """
+    return frozenset(entry["word"].lower() for entry in get_allowed_words() if entry.get("word"))
+
+
+global_allowed_words = TTLSnapshot(load_global_allowed_words, GLOBAL_WORDS_TTL, GLOBAL_WORDS_MAX_STALENESS,
+                                   version_source=lambda: list_versions.global_version)
+
+# Pipeline order for companies that have not picked one: "model_first" runs the severity
+# model on every token, "lexical_first" only on tokens that match a banned word, and
+# "message_level" scores each whole message once instead of each token
+DEFAULT_PIPELINE = os.getenv("DEFAULT_PIPELINE", "model_first")
+
+# In "message_level" mode a matched token is censored when its attribution is at least this
+# share of the largest token attribution in the message
+MESSAGE_ATTRIBUTION_SHARE = float(os.getenv("MESSAGE_ATTRIBUTION_SHARE", "0.5"))
+
+# Times each company's pattern rules fired in this worker: company_id -> Counter of patterns
+pattern_hits = {}
+pattern_hits_lock = threading.Lock()
+
+# Words, including leetspeak symbols inside them (sh!t, f*ck, $h1t), or runs of punctuation
+TOKEN_PATTERN = re.compile(r'[$@]?[a-zA-Z0-9_\-\/\\|]+(?:[!@$*+#?(<{\[]+[a-zA-Z0-9_\-\/\\|]+)*|[^\w\s]+')
 
 def is_similar(word: str, banned_words: set, ratio_threshold: int = 85, partial_threshold: int = 90) -> bool:
     """
@@ -10,18 +81,262 @@ def is_similar(word: str, banned_words: set, ratio_threshold: int = 85, partial_
     Primary: fuzz.ratio
     Secondary: fuzz.partial_ratio
     """
-    for banned_word in banned_words:
-        ratio_score = fuzz.ratio(word.lower(), banned_word)
-        partial_score = fuzz.partial_ratio(word.lower(), banned_word)
+    fuzzy_index = build_fuzzy_index(frozenset(banned_words), ratio_threshold, partial_threshold)
+    return fuzzy_index.best_match(word.lower()) is not None
+
+
+@lru_cache(maxsize=32)
+def build_fuzzy_index(banned_words: frozenset, ratio_threshold: int = 85, partial_threshold: int = 90) -> FuzzyIndex:
+    """
+    Builds the fuzzy candidate index for a banned word list once and
+    reuses it for every word checked against the same list.
+    """
+    return make_fuzzy_index(banned_words, ratio_threshold, partial_threshold)
+
+
+def get_company(api_key: str):
+    """
+    Company settings for an API key from the in-memory cache. Unknown keys
+    are cached as misses, and concurrent lookups share one database call.
+    """
+    return company_settings.get_or_load(api_key, get_company_by_api_key)
+
+
+def get_severities(words: list) -> dict:
+    """
+    Severity model output for each raw token, memoized across requests.
+    Cache misses are read from the known-term table; the rest are scored in
+    one batched model call.
+    Returns {word: model output}.
+    """
+    model_outputs = {}
+    misses = []
+    for word in dict.fromkeys(words):
+        model_output = token_severities.get(word)
+        if model_output is None:
+            misses.append(word)
+        else:
+            model_outputs[word] = model_output
+    for model_output in known_severities.predict_many(misses):
+        word = model_output["original"]
+        token_severities.put(word, model_output, TOKEN_ENTRY_BYTES + 4 * len(word))
+        model_outputs[word] = model_output
+    return model_outputs
+
+
+def get_compiled_word_list(key: tuple, normalized_words: frozenset, allowed_words: frozenset = frozenset(),
+                           patterns: tuple = ()) -> CompiledWordList:
+    """
+    Returns the compiled list cached under key (scope, list versions), compiling
+    it on a miss or when the stored words no longer match. Compiling also
+    brings the scope's terms in the known severity table up to date.
+    """
+    compiled = compiled_word_lists.get(key)
+    if compiled is None or compiled.source != (normalized_words, allowed_words, patterns):
+        compiled = CompiledWordList(normalized_words, allowed_words, patterns)
+        compiled_word_lists.put(key, compiled, compiled.size)
+        known_severities.update_source(key[0], compiled.words)
+    return compiled
+
+
+def get_tenant_word_lists(company_data: dict) -> TenantWordLists:
+    """
+    The shared global list plus the company's own list, each compiled with
+    its allowlist; the company's pattern rules are compiled with its list.
+    Custom lists are compiled and cached per company, so the global list is
+    compiled once.
+    """
+    company_id = company_data["company_id"]
+    global_words, global_version = global_banned_words.get()
+    global_allowed, allowed_version = global_allowed_words.get()
+    global_list = get_compiled_word_list(("global", global_version, allowed_version), global_words, global_allowed)
+    custom_words = frozenset(word.lower() for word in company_data.get("custom_banned_words") or [] if word)
+    custom_allowed = frozenset(word.lower() for word in company_data.get("custom_allowed_words") or [] if word)
+    patterns = tuple(company_data.get("custom_patterns") or [])
+    custom_list = get_compiled_word_list((company_id, list_versions.company_version(company_id)),
+                                         custom_words, custom_allowed, patterns)
+    return TenantWordLists(global_list, custom_list)
+
+
+def with_readings(verdicts: dict, word_lists: TenantWordLists) -> dict:
+    """
+    Replaces the verdict of raw tokens that did not match exactly after
+    normalization with an exact match of another leetspeak reading, if any.
+    """
+    inexact = [word for word, verdict in verdicts.items() if verdict is None or not verdict[2]]
+    for word, reading in zip(inexact, word_lists.match_readings(inexact)):
+        if reading is not None:
+            verdicts[word] = reading
+    return verdicts
+
+
+def allowed_raw_tokens(raw_tokens: list, word_lists: TenantWordLists) -> set:
+    """
+    The raw tokens whose normalized form is on an allowlist. They skip the
+    severity model and every matching stage.
+    """
+    normalized = [normalized_word.lower() for normalized_word in normalize_many(raw_tokens)]
+    allowed = word_lists.allowed_tokens(normalized)
+    return {word for word, normalized_word in zip(raw_tokens, normalized) if normalized_word in allowed}
 
-        # First, check if the full string similarity is above the threshold
-        if ratio_score >= ratio_threshold:
-            return True
-        # If the ratio check fails, check the partial string similarity
-        if partial_score >= partial_threshold:
-            return True
 
-    return False
+def gate_glued(verdicts: dict, company_severity) -> dict:
+    """
+    Keeps a banned word glued to ordinary words ("youareanasshole") when the
+    banned word meets the company threshold, as spaced-out words are: the
+    model would score the whole token as the ordinary words around it.
+    """
+    model_outputs = get_severities([verdict[0] for verdict in verdicts.values() if verdict[3]])
+    return {word: verdict for word, verdict in verdicts.items()
+            if not verdict[3] or model_outputs[verdict[0]]["severity"] >= company_severity}
+
+
+def match_model_first(raw_tokens: list, word_lists: TenantWordLists, company_severity) -> dict:
+    """
+    Scores every token with the severity model in one batch, then matches only
+    the tokens that meet the company threshold against the banned words. The
+    other tokens are only checked for glued banned words.
+    Returns {raw token: verdict} for the tokens to censor.
+    """
+    allowed = allowed_raw_tokens(raw_tokens, word_lists)
+    model_outputs = get_severities([word for word in raw_tokens if word not in allowed])
+    candidates = {word: model_output["normalized"].lower() for word, model_output in model_outputs.items()
+                  if model_output["severity"] >= company_severity}
+    unique_tokens = list(dict.fromkeys(candidates.values()))
+    verdicts = dict(zip(unique_tokens, word_lists.match_tokens(unique_tokens)))
+    matched = with_readings({word: verdicts[normalized_word] for word, normalized_word in candidates.items()}, word_lists)
+    others = {word: model_output["normalized"].lower() for word, model_output in model_outputs.items()
+              if word not in candidates}
+    unique_tokens = list(dict.fromkeys(others.values()))
+    glued = dict(zip(unique_tokens, word_lists.match_glued(unique_tokens)))
+    matched.update((word, glued[normalized_word]) for word, normalized_word in others.items())
+    return gate_glued({word: verdict for word, verdict in matched.items() if verdict is not None}, company_severity)
+
+
+def match_lexical(raw_tokens: list, word_lists: TenantWordLists) -> dict:
+    """
+    Matches every token against the banned words without the severity model.
+    Returns {raw token: verdict} for the tokens that matched.
+    """
+    normalized = normalize_tokens(raw_tokens)
+    allowed = word_lists.allowed_tokens(normalized.values())
+    normalized = {word: normalized_word for word, normalized_word in normalized.items() if normalized_word not in allowed}
+    unique_tokens = list(dict.fromkeys(normalized.values()))
+    verdicts = dict(zip(unique_tokens, word_lists.match_tokens(unique_tokens)))
+    matched = with_readings({word: verdicts[normalized_word] for word, normalized_word in normalized.items()}, word_lists)
+    return {word: verdict for word, verdict in matched.items() if verdict is not None}
+
+
+def match_lexical_first(raw_tokens: list, word_lists: TenantWordLists, company_severity) -> dict:
+    """
+    Matches every token against the banned words first and runs the severity
+    model only on the tokens that matched. Clean chat never reaches the model.
+    Gives the same result as match_model_first: a token is censored when it
+    matches and meets the threshold, whichever is checked first.
+    """
+    matched = match_lexical(raw_tokens, word_lists)
+    model_outputs = get_severities([word for word, verdict in matched.items() if not verdict[3]])
+    return gate_glued({word: verdict for word, verdict in matched.items()
+                       if verdict[3] or model_outputs[word]["severity"] >= company_severity}, company_severity)
+
+
+def match_message_level(raw_tokens: list, word_lists: TenantWordLists, company_severity) -> dict:
+    """
+    Matches every token against the banned words for the message-level
+    pipeline. Exact and leetspeak matches stand on their own; a fuzzy-only
+    match also needs the severity model to score the token at the threshold,
+    since the message score alone cannot tell "was" from a banned word.
+    Returns {raw token: verdict} for the tokens that may be censored.
+    """
+    matched = match_lexical(raw_tokens, word_lists)
+    model_outputs = get_severities([word for word, verdict in matched.items() if not verdict[2] and not verdict[3]])
+    return gate_glued({word: verdict for word, verdict in matched.items()
+                       if word not in model_outputs or model_outputs[word]["severity"] >= company_severity}, company_severity)
+
+
+def normalize_tokens(raw_tokens: list) -> dict:
+    """
+    {raw token: normalized token} for the distinct tokens of a batch, so the
+    stages that join tokens across a message (spaced-out words, phrases)
+    read them instead of normalizing every message again.
+    """
+    return {word: normalized_word.lower() for word, normalized_word in zip(raw_tokens, normalize_many(raw_tokens))}
+
+
+def spaced_runs(tokens: list) -> list:
+    """
+    Groups a message's tokens into runs of consecutive single characters
+    ("f u c k"); punctuation between them (a.s.s) does not break a run.
+    Longer words are never joined, so ordinary short words ("no gg",
+    "an us", "pen is") cannot spell a banned word together. Returns the
+    token indices of every run of at least two characters.
+    """
+    runs, run = [], []
+    for index, token in enumerate(tokens):
+        word = token.group()
+        if not any(char.isalnum() for char in word):
+            continue  # Punctuation and separators
+        if len(word) == 1:
+            run.append(index)
+            continue
+        if len(run) >= 2:
+            runs.append(run)
+        run = []
+    if len(run) >= 2:
+        runs.append(run)
+    return runs
+
+
+def match_spaced(tokens: list, word_lists: TenantWordLists, normalized_tokens: dict) -> list:
+    """
+    Finds banned words spelled across several single-character tokens of one
+    message. Each run's normalized tokens ({raw token: normalized token},
+    computed once per batch) are joined into a de-spaced view, and the view
+    goes through the automaton once, so a run costs linear time however many
+    ways its tokens could be combined.
+    Returns (first token index, last token index + 1, banned word, de-spaced text).
+    """
+    matches = []
+    for run in spaced_runs(tokens):
+        pieces = [(index, normalized_tokens[tokens[index].group()]) for index in run
+                  if normalized_tokens[tokens[index].group()]]
+        text = [piece for _, piece in pieces]
+        for first, last, banned_word in word_lists.find_spanning_matches(text):
+            matches.append((pieces[first][0], pieces[last - 1][0] + 1, banned_word, "".join(text[first:last])))
+    return matches
+
+
+def match_phrases(tokens: list, word_lists: TenantWordLists, normalized_tokens: dict) -> list:
+    """
+    Finds banned multi-word phrases in one message. Punctuation between the
+    words does not break a phrase ("2 girls, 1 cup").
+    Returns (first token index, last token index + 1, phrase).
+    """
+    normalized = [(index, normalized_tokens[token.group()]) for index, token in enumerate(tokens)
+                  if normalized_tokens[token.group()] and any(char.isalnum() for char in token.group())]
+    return [(normalized[first][0], normalized[last - 1][0] + 1, phrase)
+            for first, last, phrase in word_lists.find_phrases([normalized_word for _, normalized_word in normalized])]
+
+
+def record_pattern_hits(company_id, pattern_matches: list):
+    hits = Counter(pattern for message_patterns in pattern_matches for _, _, pattern in message_patterns)
+    if hits:
+        with pattern_hits_lock:
+            pattern_hits.setdefault(company_id, Counter()).update(hits)
+
+
+def get_pattern_stats(company_data: dict) -> dict:
+    """
+    How often each of the company's pattern rules fired in this worker, how
+    many scans hit the timeout, and the rules left out by the complexity guard
+    with the reason.
+    """
+    pattern_rules = get_tenant_word_lists(company_data).lists[1].pattern_rules
+    with pattern_hits_lock:
+        hits = dict(pattern_hits.get(company_data["company_id"], {}))
+    return {"rules": [{"pattern": pattern, "matches": hits.get(pattern, 0)} for pattern in pattern_rules.patterns],
+            "timeouts": pattern_rules.timeouts,
+            "rejected": [{"pattern": pattern, "reason": reason} for pattern, reason in pattern_rules.rejected.items()]}
 
 
 def check_profanity(text: str, api_key: str) -> dict:
@@ -29,51 +344,106 @@ def check_profanity(text: str, api_key: str) -> dict:
     Checks for profanity using AI-driven transformations, leetspeak normalization, 
     spacing normalization, and fuzzy matching.
     """
-    company_data = get_company_by_api_key(api_key)
+    result = check_profanity_batch([text], api_key)
+    if "error" in result:
+        return result
+    return result["results"][0]
+
+
+def check_profanity_batch(texts: list, api_key: str) -> dict:
+    """
+    Checks many messages for the same company at once. Fuzzy matching for
+    every token of every message is scored in one batched call.
+    """
+    company_data = get_company(api_key)
     if not company_data:
         return {"error": "Invalid API key"}
 
     company_id = company_data["company_id"]
     company_severity = company_data["profanity_tolerance"]
-    custom_banned_words = set(company_data.get("custom_banned_words", []))
-
-    # Fetch global banned words and merge with company-specific ones
-    global_banned_words = {entry["word"] for entry in get_banned_words()}
-    banned_words = global_banned_words.union(custom_banned_words)
-
-    # Step 1: Split the text into words and punctuation while keeping punctuation intact
-    words_and_punct = re.findall(r'[a-zA-Z0-9_\-\/\\|]+|[^\w\s]+', text)
-
-    flagged_words = []  # This needs to be defined before usage
-    censored_text = text  # Initialize censored_text with original text
-
-    # Step 2: Censor words and keep punctuation intact
-    for word in words_and_punct:
-        print(word)
-        # Get the severity score first
-        model_output = predict_severity(word)
-        severity = model_output["severity"]
-        print(severity)
-        normalized_word = model_output["normalized"]
-        # Skip this word if its severity is below the company threshold
-        if severity < company_severity:
-            continue  # Skip processing for words that don't meet the severity threshold
-
-        # If the word is in banned words, add it to flagged_words and censor it
-        if normalized_word.lower() in banned_words:
-            flagged_words.append(normalized_word.lower())  # Exact match
-            censored_text = censored_text.replace(word, "*" * len(word))  # Censor word
-
-        # If the word is similar to a banned word, find the matched banned word and censor it
-        elif is_similar(normalized_word.lower(), banned_words):
-            matched_word = next(banned_word for banned_word in banned_words 
-                if (fuzz.ratio(normalized_word.lower(), banned_word) >= 85 or fuzz.partial_ratio(normalized_word.lower(), banned_word) >= 90))
-            flagged_words.append(matched_word.lower())  # Fuzzy match
-            censored_text = censored_text.replace(word, "*" * len(word))  # Censor word
-
-    # Step 3: Log flagged messages
-    if flagged_words:
-        insert_flagged_message(company_id, text, censored_text, flagged_words)
-
-    # Return censored text and flagged words
-    return {"censored_text": censored_text, "flagged_words": flagged_words}
+
+    # Global banned words come from the in-memory snapshot and are matched together with company-specific ones
+    word_lists = get_tenant_word_lists(company_data)
+
+    # Step 1: Fold Unicode lookalikes, then split each text into words and punctuation.
+    # Offsets map token positions back to the original text; plain ASCII text is used as is
+    # Pattern rules run once per message, on the whole folded text
+    tokenized = []
+    pattern_matches = []
+    for text in texts:
+        canonical_text, offsets = canonicalize(text)
+        tokenized.append((text, offsets, list(TOKEN_PATTERN.finditer(canonical_text))))
+        pattern_matches.append(word_lists.find_patterns(canonical_text))
+    record_pattern_hits(company_id, pattern_matches)
+    raw_tokens = list(dict.fromkeys(token.group() for _, _, tokens in tokenized for token in tokens))
+
+    # Step 2: Decide which distinct tokens to censor, in the company's pipeline order
+    pipeline = company_data.get("pipeline") or DEFAULT_PIPELINE
+    message_scores = [None] * len(texts)
+    if pipeline == "message_level":
+        # One inference per message; matched tokens are censored when the message meets
+        # the threshold and the token is among the ones driving its severity
+        verdicts = match_message_level(raw_tokens, word_lists, company_severity)
+        message_scores = [score_message([token.group() for token in tokens]) for _, _, tokens in tokenized]
+    elif pipeline == "lexical_first":
+        verdicts = match_lexical_first(raw_tokens, word_lists, company_severity)
+    else:
+        verdicts = match_model_first(raw_tokens, word_lists, company_severity)
+
+    # Words spelled across several tokens are scored like a single token, in every pipeline
+    normalized_tokens = normalize_tokens(raw_tokens)
+    spaced_matches = [match_spaced(tokens, word_lists, normalized_tokens) for _, _, tokens in tokenized]
+    spaced_severities = get_severities([match[3] for message_matches in spaced_matches for match in message_matches])
+    # Phrases and pattern rules are explicit bans the per-word severity model cannot score, so they are always censored
+    phrase_matches = [match_phrases(tokens, word_lists, normalized_tokens) for _, _, tokens in tokenized]
+
+    results = []
+    for (text, offsets, tokens), message_score, message_spaced, message_phrases, message_patterns in zip(
+            tokenized, message_scores, spaced_matches, phrase_matches, pattern_matches):
+        matches = []  # (start, end, banned word) in the original text
+        if message_score is not None:
+            min_attribution = MESSAGE_ATTRIBUTION_SHARE * max(message_score["attributions"], default=0)
+        for index, token in enumerate(tokens):
+            verdict = verdicts.get(token.group())
+            if verdict is None:
+                continue
+            if message_score is not None and (message_score["severity"] < company_severity
+                                              or message_score["attributions"][index] <= 0
+                                              or message_score["attributions"][index] < min_attribution):
+                continue
+            start, end = original_span(offsets, token.start(), token.end())
+            matches.append((start, end, verdict[0]))
+        for first, last, banned_word, spaced_text in message_spaced:
+            if spaced_severities[spaced_text]["severity"] < company_severity:
+                continue
+            start, end = original_span(offsets, tokens[first].start(), tokens[last - 1].end())
+            matches.append((start, end, banned_word))
+        for first, last, phrase in message_phrases:
+            start, end = original_span(offsets, tokens[first].start(), tokens[last - 1].end())
+            matches.append((start, end, phrase))
+        for start, end, pattern in message_patterns:
+            start, end = original_span(offsets, start, end)
+            matches.append((start, end, pattern))
+        # A match inside a longer one is the same text found twice (the letters of a spaced-out
+        # word, "a s s" as both a spaced word and a phrase), so only the longer one is reported
+        matches = drop_covered(matches)
+        flagged_words = [word for _, _, word in matches]
+
+        # Step 3: Censor the merged match spans in one pass
+        censored_text = apply_censor(text, [(start, end) for start, end, _ in matches])
+
+        # Step 4: Log flagged messages
+        if flagged_words:
+            insert_flagged_message(company_id, text, censored_text, flagged_words)
+
+        result = {"censored_text": censored_text, "flagged_words": flagged_words, "spans": spans_to_json(matches)}
+        if message_score is not None:
+            result["severity"] = message_score["severity"]
+            result["attributions"] = []
+            for token, attribution in zip(tokens, message_score["attributions"]):
+                if attribution > 0:
+                    start, end = original_span(offsets, token.start(), token.end())
+                    result["attributions"].append({"start": start, "end": end, "score": attribution})
+        results.append(result)
+
+    return {"results": results}
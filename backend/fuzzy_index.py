@@ -0,0 +1,329 @@
+import os
+from bisect import bisect_left
+from functools import lru_cache
+from rapidfuzz import fuzz, process
+from rapidfuzz.distance import Indel
+
+# Threads per batched scoring call; the API already runs one request per worker thread
+FUZZY_WORKERS = int(os.getenv("FUZZY_WORKERS", "1"))
+
+
+def score(scorer, token: str, banned_word: str) -> int:
+    """
+    A rapidfuzz score rounded to an integer percentage, as the thresholds are.
+    """
+    return int(round(scorer(token, banned_word)))
+
+
+def ratio_radius(length: int, threshold: int) -> int:
+    """
+    Largest indel distance at which a word of any length can still reach
+    the fuzz.ratio threshold against a token of the given length.
+    """
+    # fuzz.ratio rounds to the nearest integer, so stay one point below the threshold
+    cutoff = (threshold - 1) / 100
+    return int(2 * length * (1 - cutoff) / cutoff)
+
+
+@lru_cache(maxsize=None)
+def partial_max_edits(length: int, threshold: int) -> int:
+    """
+    Largest indel distance between the shorter string (of the given length)
+    and its best window in the longer string that still lets
+    fuzz.partial_ratio reach the threshold.
+    """
+    cutoff = threshold - 1
+    max_edits = 0
+    for window in range(1, length + 1):
+        for matched in range(window, -1, -1):
+            if 200 * matched < cutoff * (length + window):
+                break
+            max_edits = max(max_edits, length + window - 2 * matched)
+    return max_edits
+
+
+def trigrams(word: str) -> set:
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree keyed on indel distance, the distance fuzz.ratio
+    is based on (and a metric). A lookup only descends into children whose
+    edge distance can still be within the radius.
+    """
+
+    def __init__(self, words):
+        self.root = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            distance = Indel.distance(word, node[0])
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word: str, radius: int) -> list:
+        """
+        Returns (distance, word) for every stored word within the radius.
+        """
+        if self.root is None:
+            return []
+        found = []
+        stack = [self.root]
+        while stack:
+            node_word, children = stack.pop()
+            distance = Indel.distance(word, node_word)
+            if distance <= radius:
+                found.append((distance, node_word))
+            for edge, child in children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class LevenshteinTrie:
+    """
+    Character trie of banned words searched with a bounded edit distance.
+    Each trie node carries one row of the Levenshtein automaton for the
+    token, so shared prefixes are evaluated once and a branch is dropped
+    as soon as every cell of its row is over the bound.
+    """
+
+    def __init__(self, words):
+        self.root = ({}, None)
+        for word in words:
+            node = self.root
+            for char in word:
+                node = node[0].setdefault(char, ({}, []))
+            node[1].append(word)
+
+    def search(self, word: str, max_edits: int) -> list:
+        """
+        Returns (distance, banned_word) for every word within max_edits
+        Levenshtein edits of the given word.
+        """
+        found = []
+        length = len(word)
+        over = max_edits + 1
+        # Only cells within max_edits of the diagonal can stay in bounds
+        first_row = [column if column <= max_edits else over for column in range(length + 1)]
+        stack = [(char, child, 1, first_row) for char, child in self.root[0].items()]
+        while stack:
+            char, (children, words), depth, previous_row = stack.pop()
+            row = [over] * (length + 1)
+            row[0] = min(depth, over)
+            for column in range(max(1, depth - max_edits), min(length, depth + max_edits) + 1):
+                row[column] = min(row[column - 1] + 1,
+                                  previous_row[column] + 1,
+                                  previous_row[column - 1] + (word[column - 1] != char),
+                                  over)
+            if row[length] <= max_edits and words:
+                found.extend((row[length], banned_word) for banned_word in words)
+            if min(row) <= max_edits:
+                stack.extend((next_char, child, depth + 1, row) for next_char, child in children.items())
+        return found
+
+
+class TrigramIndex:
+    """
+    Inverted index from character trigrams to banned words. Narrows a token
+    to the banned words that share enough trigrams to possibly reach the
+    fuzz.partial_ratio threshold, so only those need the exact score.
+    """
+
+    def __init__(self, words, threshold: int = 90):
+        self.threshold = threshold
+        # Longest words last, so the words longer than a token are a suffix
+        self.words = sorted(set(words), key=lambda word: (len(word), word))
+        self.lengths = [len(word) for word in self.words]
+        self.trigram_counts = []
+        self.postings = {}
+        self.short_substrings = {}
+        self.unfiltered = []  # Words too short or too repetitive to filter by trigram
+
+        for word_id, word in enumerate(self.words):
+            word_trigrams = trigrams(word)
+            self.trigram_counts.append(len(word_trigrams))
+            for trigram in word_trigrams:
+                self.postings.setdefault(trigram, []).append(word_id)
+            for size in (1, 2):
+                for i in range(len(word) - size + 1):
+                    self.short_substrings.setdefault(word[i:i + size], set()).add(word_id)
+            if self._required_shared(len(word), len(word_trigrams)) <= 0:
+                self.unfiltered.append(word_id)
+
+    def _required_shared(self, length: int, trigram_count: int) -> int:
+        # Every edit destroys at most three trigrams of the shorter string
+        return trigram_count - 3 * partial_max_edits(length, self.threshold)
+
+    def candidates(self, token: str) -> list:
+        """
+        Returns the banned words that can reach the partial_ratio threshold
+        against the token. The cost depends on the token's trigrams, not
+        on the size of the word list.
+        """
+        token_length = len(token)
+        token_trigrams = trigrams(token)
+        token_required = self._required_shared(token_length, len(token_trigrams))
+
+        shared = {}
+        for trigram in token_trigrams:
+            for word_id in self.postings.get(trigram, ()):
+                shared[word_id] = shared.get(word_id, 0) + 1
+
+        found = set()
+        for word_id, count in shared.items():
+            if token_length <= self.lengths[word_id]:
+                required = token_required  # The token is the shorter string
+            else:
+                required = self._required_shared(self.lengths[word_id], self.trigram_counts[word_id])
+            if count >= required:
+                found.add(word_id)
+
+        for word_id in self.unfiltered:
+            if self.lengths[word_id] < token_length:
+                found.add(word_id)
+
+        if token_required <= 0:
+            if token_length <= 2 and partial_max_edits(token_length, self.threshold) == 0:
+                # Short tokens have to appear verbatim inside the banned word
+                found.update(word_id for word_id in self.short_substrings.get(token, ())
+                             if self.lengths[word_id] >= token_length)
+            else:
+                found.update(range(bisect_left(self.lengths, token_length), len(self.words)))
+
+        return [self.words[word_id] for word_id in sorted(found)]
+
+
+class FuzzyIndex:
+    """
+    Fuzzy candidate index built once per banned word list. Finds the best
+    matching banned word for a token with the same acceptance rules as
+    fuzz.ratio >= ratio_threshold or fuzz.partial_ratio >= partial_threshold.
+    """
+
+    def __init__(self, words, ratio_threshold: int = 85, partial_threshold: int = 90):
+        self.words = sorted(set(words))
+        self.ratio_threshold = ratio_threshold
+        self.partial_threshold = partial_threshold
+        self._build_ratio_index()
+        self.trigram_index = TrigramIndex(self.words, partial_threshold)
+        self.max_length = max((len(word) for word in self.words), default=0)
+
+    def _build_ratio_index(self):
+        self.tree = BKTree(self.words)
+
+    def ratio_candidates(self, token: str) -> list:
+        """
+        Returns the banned words that can reach the fuzz.ratio threshold against the token.
+        """
+        # Long pasted strings cannot be close to any whole banned word, so the
+        # tree is only searched when a word is long enough to be in range
+        cutoff = (self.ratio_threshold - 1) / 100
+        radius = min(ratio_radius(len(token), self.ratio_threshold),
+                     int((1 - cutoff) * (len(token) + self.max_length)))
+        if len(token) - self.max_length > radius:
+            return []
+        return [banned_word for _, banned_word in self.tree.search(token, radius)]
+
+    def best_match(self, token: str):
+        """
+        Returns (banned_word, score) for the best accepted banned word, or None.
+        Full-string matches win over partial matches, as in is_similar.
+        """
+        if not token:
+            return None
+
+        best = None
+        for banned_word in self.ratio_candidates(token):
+            ratio = score(fuzz.ratio, token, banned_word)
+            if ratio >= self.ratio_threshold and (best is None or ratio > best[1]):
+                best = (banned_word, ratio)
+        if best is not None:
+            return best
+
+        for banned_word in self.trigram_index.candidates(token):
+            ratio = score(fuzz.partial_ratio, token, banned_word)
+            if ratio >= self.partial_threshold and (best is None or ratio > best[1]):
+                best = (banned_word, ratio)
+                if ratio == 100:
+                    break
+        return best
+
+    def best_matches(self, tokens: list) -> list:
+        """
+        Batched best_match for all tokens of a message, or of many messages.
+        Full-string matching is limited to the ratio index candidates and
+        partial matching to the trigram candidates; tokens that share
+        candidates are scored in one native cdist call on FUZZY_WORKERS
+        threads. Duplicate tokens are scored once.
+        Returns one (banned_word, score) or None per token.
+        """
+        unique_tokens = list(dict.fromkeys(token for token in tokens if token))
+        if not unique_tokens:
+            return [None] * len(tokens)
+
+        results = self._score_batch(unique_tokens, fuzz.ratio, self.ratio_threshold, self.ratio_candidates)
+        # Full-string matches win, so only the rest need partial scoring
+        remaining = [token for token in unique_tokens if results[token] is None]
+        if remaining:
+            results.update(self._score_batch(remaining, fuzz.partial_ratio,
+                                             self.partial_threshold, self.trigram_index.candidates))
+        return [results.get(token) for token in tokens]
+
+    def _score_batch(self, tokens: list, scorer, threshold: int, candidates) -> dict:
+        results = dict.fromkeys(tokens)
+        # Tokens are only scored against their own candidates; tokens with the
+        # same candidates (short tokens, repeated typos) share one cdist call
+        groups = {}
+        for token in tokens:
+            groups.setdefault(tuple(candidates(token)), []).append(token)
+
+        for banned_words, group in groups.items():
+            if not banned_words:
+                continue
+            if len(group) == 1:
+                match = process.extractOne(group[0], banned_words, scorer=scorer, score_cutoff=threshold - 1)
+                matches = [match and (match[0], match[1])]
+            else:
+                scores = process.cdist(group, banned_words, scorer=scorer,
+                                       score_cutoff=threshold - 1, workers=FUZZY_WORKERS)
+                best_columns = scores.argmax(axis=1)
+                matches = [(banned_words[column], float(scores[row, column])) for row, column in enumerate(best_columns)]
+            for token, match in zip(group, matches):
+                # Scores are rounded as in best_match before comparing against the threshold
+                if match and int(round(match[1])) >= threshold:
+                    results[token] = (match[0], int(round(match[1])))
+        return results
+
+
+class TrieFuzzyIndex(FuzzyIndex):
+    """
+    FuzzyIndex that finds full-string candidates with a Levenshtein trie
+    walk bounded to max_edits. The cost per token depends on its length and
+    the bound, not on how many words the tenants add. Tokens that would need
+    more than max_edits edits to reach the ratio threshold are not matched
+    on the full string; partial matching is unchanged.
+    """
+
+    def __init__(self, words, ratio_threshold: int = 85, partial_threshold: int = 90, max_edits: int = 2):
+        self.max_edits = max_edits
+        super().__init__(words, ratio_threshold, partial_threshold)
+
+    def _build_ratio_index(self):
+        self.trie = LevenshteinTrie(self.words)
+
+    def ratio_candidates(self, token: str) -> list:
+        max_edits = min(self.max_edits, ratio_radius(len(token), self.ratio_threshold))
+        return [banned_word for _, banned_word in self.trie.search(token, max_edits)]
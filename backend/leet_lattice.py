@@ -0,0 +1,130 @@
+from matcher import BannedWordMatcher
+
+# Alternative readings of leetspeak characters. normalize_word picks one reading per
+# character; the lattice keeps all of them, e.g. "1" is an "i" or an "l".
+LEET_READINGS = {
+    "0": "o", "1": "il", "!": "il", "|": "li", "3": "e", "4": "a", "@": "a", "5": "s", "$": "s",
+    "7": "t", "+": "t", "9": "g", "6": "gb", "8": "b", "2": "z", "(": "c", "<": "c", "{": "c",
+    "[": "c", "€": "e", "£": "l", "¡": "i",
+}
+
+# Sequences of several characters that read as one letter
+SEQUENCE_READINGS = {
+    "|\\|": "n", "/\\/": "n", "|\\/|": "m", "/\\/\\": "m", "\\/\\/": "w", "vv": "w", "\\/": "v",
+    "()": "o", "[]": "o", "|<": "k", "|)": "d", "|-|": "h", "ph": "f", "|_|": "u", "><": "x",
+}
+
+# Characters read as nothing (f_u_c_k) and characters that stand for any one letter (f*ck)
+SKIPPED = "_-."
+WILDCARDS = "*?#"
+
+LATTICE_CHARACTERS = frozenset(LEET_READINGS) | frozenset(SKIPPED) | frozenset(WILDCARDS) | frozenset("|/\\<>()[]")
+
+
+def needs_lattice(token: str) -> bool:
+    """
+    Whether a token has any character or sequence with a reading other than
+    itself. Tokens without a single letter (scores like "455", "#1", "***")
+    are never read as words.
+    """
+    if not any(char.isalpha() for char in token):
+        return False
+    return (any(char in LATTICE_CHARACTERS for char in token)
+            or any(sequence in token for sequence in SEQUENCE_READINGS if sequence.isalpha()))
+
+
+def token_lattice(token: str) -> list:
+    """
+    The alternative readings of a token as edges per start position:
+    lattice[i] is a list of (end position, letters), where letters is ""
+    for a skipped character and None for a wildcard.
+    """
+    lattice = [[] for _ in token]
+    for position, char in enumerate(token):
+        edges = lattice[position]
+        if char in SKIPPED:
+            edges.append((position + 1, ""))
+        elif char in WILDCARDS:
+            # Also read literally, for lists that spell words with them
+            edges.extend([(position + 1, None), (position + 1, char)])
+        else:
+            edges.extend((position + 1, letter) for letter in LEET_READINGS.get(char, char))
+        for sequence, letter in SEQUENCE_READINGS.items():
+            if token.startswith(sequence, position):
+                edges.append((position + len(sequence), letter))
+    return lattice
+
+
+class LeetTrie:
+    """
+    Trie of banned words walked over every path of a token's lattice at once.
+    States are (lattice position, trie node, last letter), and each state is
+    kept once with the fewest wildcards that reach it, so a walk costs at
+    most the token length times the trie size however many readings the
+    token has. Repeated letters may be absorbed by the node that read them,
+    as the exact-match automaton does.
+    """
+
+    def __init__(self, matcher: BannedWordMatcher, words: frozenset):
+        # Shares the exact-match automaton's goto table, a trie of the words (and any allowed words)
+        self.children = matcher.goto
+        self.words = {}
+        for node, outputs in enumerate(matcher.output):
+            for word in outputs:
+                if len(word) == matcher.depth[node] and word in words:
+                    self.words[node] = word
+
+    def match(self, token: str):
+        """
+        Returns the banned word some reading of the whole token spells, or None.
+        A wildcard never stands for the first letter, and wildcards may stand
+        for at most half of the word's letters ("f**k", not "a**").
+        Readings with fewer wildcards win, then longer words (which absorbed
+        fewer repeats), then the alphabetically first, so an ambiguous token
+        reports the same word on every call.
+        """
+        token = token.lower()
+        lattice = token_lattice(token)
+        # Best (fewest) wildcards used to reach each (node, last) state per position
+        states = [{} for _ in range(len(token) + 1)]
+        states[0][(0, "")] = 0
+        for position, edges in enumerate(lattice):
+            if not states[position]:
+                continue
+            for end, letters in edges:
+                reached = states[end]
+                for (node, last), wildcards in states[position].items():
+                    if letters is None:
+                        if node == 0:
+                            continue
+                        following = [(child, letter) for letter, child in self.children[node].items()]
+                        wildcards += 1
+                    elif letters == "":
+                        following = [(node, last)]
+                    else:
+                        following = self.advance(node, last, letters)
+                    for state in following:
+                        if wildcards < reached.get(state, len(token) + 1):
+                            reached[state] = wildcards
+        matches = [(wildcards, -len(self.words[node]), self.words[node]) for (node, _), wildcards in states[len(token)].items()
+                   if node in self.words and 2 * wildcards <= len(self.words[node])]
+        return min(matches)[2] if matches else None
+
+    def advance(self, node: int, last: str, letters: str) -> list:
+        """
+        Trie states after reading letters from (node, last), including the
+        ones where a repeat of the last letter is absorbed.
+        """
+        current = [(node, last)]
+        for letter in letters:
+            following = []
+            for state, previous in current:
+                child = self.children[state].get(letter)
+                if child is not None:
+                    following.append((child, letter))
+                if letter == previous and state:
+                    following.append((state, previous))
+            current = following
+            if not current:
+                break
+        return current
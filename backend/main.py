@@ -1,14 +1,32 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from filter import check_profanity
-from database import insert_company, get_company_by_name, generate_api_key, get_flagged_messages, get_company_by_api_key
+from typing import Literal, Optional
+from filter import check_profanity, check_profanity_batch, get_company, get_pattern_stats
+from pattern_rules import pattern_problem, MAX_PATTERNS
+from cache import token_severities, token_verdicts
+from severity_table import known_severities, dataset_terms
+from word_break import get_clean_dictionary
+from database import insert_company, get_company_by_name, generate_api_key, get_flagged_messages
 
 app = FastAPI()
 
+@app.on_event("startup")
+def load_known_severities():
+    # Score the training vocabulary once per worker; banned word lists are added as they are compiled
+    known_severities.update_source("dataset", dataset_terms())
+
+@app.on_event("startup")
+def load_clean_dictionary():
+    # Build the dictionary trie up front so the first long token does not wait for it
+    get_clean_dictionary()
+
 # Define user registration
 class UserRegistration(BaseModel):
     name: str
     custom_banned_words: list[str]
+    custom_allowed_words: list[str] = []
+    custom_patterns: list[str] = []
+    pipeline: Optional[Literal["model_first", "lexical_first", "message_level"]] = None  # None: the deployment's DEFAULT_PIPELINE
     
 @app.post("/register")
 async def register_company(company: UserRegistration):
@@ -17,11 +35,20 @@ async def register_company(company: UserRegistration):
     if existing_company:
         raise HTTPException(status_code=400, detail="Company with this API key already exists.")
     
+    # Refuse pattern rules that are invalid or could backtrack catastrophically
+    if len(company.custom_patterns) > MAX_PATTERNS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PATTERNS} patterns are allowed.")
+    for pattern in company.custom_patterns:
+        problem = pattern_problem(pattern)
+        if problem:
+            raise HTTPException(status_code=400, detail=f"Pattern {pattern!r} rejected: {problem}")
+
     # Generate a new unique API key
     api_key = generate_api_key()
     
     # Register the company
-    insert_company(company.name, api_key, company.custom_banned_words)
+    insert_company(company.name, api_key, company.custom_banned_words, company.pipeline, company.custom_allowed_words,
+                   company.custom_patterns)
     return {"message": "Company registered successfully"}
 
 # Define input model
@@ -40,10 +67,25 @@ def moderate_text(input_text: TextInput):
 
     return result  # FastAPI automatically formats this as JSON
 
+# Define batch input model
+class TextBatchInput(BaseModel):
+    texts: list[str]
+    api_key: str
+
+@app.post("/moderate-batch")
+def moderate_text_batch(input_batch: TextBatchInput):
+    # Check all messages at once so fuzzy matching is scored in one batch
+    result = check_profanity_batch(input_batch.texts, input_batch.api_key)
+
+    if "error" in result:
+        raise HTTPException(status_code=400, detail=result["error"])
+
+    return result
+
 @app.get("/company-stats")
 async def get_company_stats(api_key: str):
     # Get company data using API key
-    company = get_company_by_api_key(api_key)
+    company = get_company(api_key)
     if not company:
         raise HTTPException(status_code=404, detail="Company not found.")
     
@@ -53,3 +95,17 @@ async def get_company_stats(api_key: str):
     flagged_messages = get_flagged_messages(company_id)
     
     return {"company": company["company_name"], "flagged_messages": flagged_messages}
+
+@app.get("/pattern-stats")
+async def get_company_pattern_stats(api_key: str):
+    # Which of the company's pattern rules fired in this worker, and which were rejected
+    company = get_company(api_key)
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found.")
+    return get_pattern_stats(company)
+
+@app.get("/cache-stats")
+async def get_cache_stats():
+    # Hit/miss counters for the per-token caches of this worker
+    return {"token_severities": token_severities.stats(), "token_verdicts": token_verdicts.stats(),
+            "known_severities": known_severities.stats()}
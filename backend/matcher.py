@@ -0,0 +1,110 @@
+import re
+from collections import deque
+
+RUN = re.compile(r"(.)\1*", re.DOTALL)
+
+
+def letter_runs(text: str):
+    """
+    Splits text into runs of one repeated letter.
+    Returns (the letters, one per run; the (start, end) of each run in text).
+    """
+    spans = [run.span() for run in RUN.finditer(text)]
+    return "".join(text[start] for start, _ in spans), spans
+
+
+class BannedWordMatcher:
+    """
+    Aho-Corasick automaton compiled once from the banned word list.
+    Finds every occurrence of every banned word in a single linear pass
+    and absorbs stretched letters (e.g. fuuuuck): the automaton runs over
+    the text with each run of a repeated letter read as one letter, and a
+    word matches where every one of its runs fits in the text's run
+    ("ass" needs at least two s, "fuuuuck" is "fuck").
+
+    goto, depth and output also describe a plain trie of the words, which
+    the leetspeak lattice and the word-break check walk letter by letter.
+    """
+
+    def __init__(self, words):
+        # Plain trie: state 0 is the root; output holds the word ending at a state
+        self.goto = [{}]
+        self.depth = [0]
+        self.output = [()]
+        # Automaton over the words with repeated letters collapsed, e.g. "ass" is read "as"
+        self.run_goto = [{}]
+        self.fail = [0]
+        # (word, run lengths) for every word ending at a state; None when no letter of the word repeats
+        self.run_output = [()]
+
+        for word in words:
+            if word:
+                self._add_word(word)
+        self._build_links()
+
+    def _add_word(self, word: str):
+        state = 0
+        for char in word:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.depth.append(self.depth[state] + 1)
+                self.output.append(())
+            state = next_state
+        if word in self.output[state]:
+            return
+        self.output[state] = self.output[state] + (word,)
+
+        letters, spans = letter_runs(word)
+        counts = tuple(end - start for start, end in spans)
+        state = 0
+        for char in letters:
+            next_state = self.run_goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.run_goto)
+                self.run_goto[state][char] = next_state
+                self.run_goto.append({})
+                self.fail.append(0)
+                self.run_output.append(())
+            state = next_state
+        repeats = counts if len(letters) < len(word) else None
+        self.run_output[state] = self.run_output[state] + ((word, len(letters), repeats),)
+
+    def _build_links(self):
+        # Breadth-first so every failure target is finished before it is used
+        queue = deque(self.run_goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.run_goto[state].items():
+                fallback = self.fail[state]
+                while fallback and char not in self.run_goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.run_goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                # Words that end in the failure state also end here
+                self.run_output[next_state] = self.run_output[next_state] + self.run_output[self.fail[next_state]]
+                queue.append(next_state)
+
+    def find_all(self, text: str) -> list:
+        """
+        Returns (start, end, word) for every banned word found in text.
+        Repeated letters are matched against a single letter of the banned
+        word, so the span covers the whole stretched form, from the start
+        of its first run to the end of its last.
+        """
+        letters, spans = letter_runs(text)
+        run_goto, fail, run_output = self.run_goto, self.fail, self.run_output
+        matches = []
+        state = 0
+        for index, char in enumerate(letters):
+            while state and char not in run_goto[state]:
+                state = fail[state]
+            state = run_goto[state].get(char, 0)
+            for word, length, repeats in run_output[state]:
+                first = index + 1 - length
+                if repeats is None or all(spans[first + offset][1] - spans[first + offset][0] >= count
+                                          for offset, count in enumerate(repeats)):
+                    matches.append((spans[first][0], spans[index][1], word))
+        return matches
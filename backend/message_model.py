@@ -0,0 +1,59 @@
+import threading
+from bisect import bisect_right
+from model2 import normalize_many, SEVERITY_WEIGHTS
+
+# Message-level severity model: char n-grams over a whole normalized message, trained by train.py
+message_model = None
+message_model_lock = threading.Lock()
+
+
+def get_message_model():
+    global message_model
+    if message_model is None:
+        with message_model_lock:
+            if message_model is None:
+                from model_artifacts import require_artifacts
+                from ngram_model import NgramLinearModel
+                message_model = NgramLinearModel(require_artifacts("message_severity", weights=SEVERITY_WEIGHTS))
+    return message_model
+
+
+def message_text(tokens: list):
+    """
+    Joins the normalized tokens of a message the way the message model was
+    trained on them. Returns the text and each token's (start, end) in it;
+    tokens that normalize to nothing get an empty span.
+    """
+    pieces, offsets = [], []
+    position = 0
+    for normalized_token in normalize_many(tokens):
+        normalized_token = normalized_token.lower()
+        if not normalized_token:
+            offsets.append((position, position))
+            continue
+        if pieces:
+            position += 1
+        pieces.append(normalized_token)
+        offsets.append((position, position + len(normalized_token)))
+        position += len(normalized_token)
+    return " ".join(pieces), offsets
+
+
+def score_message(tokens: list) -> dict:
+    """
+    Scores a whole message with one model inference. Each n-gram's share of
+    the score is attributed to the token it lies in; n-grams that cross a
+    separator span two tokens and are attributed to neither, so a word's
+    attribution never includes its neighbours' letters.
+    Returns {"severity": message severity, "attributions": [score per token]}.
+    """
+    text, offsets = message_text(tokens)
+    severity, contributions = get_message_model().explain(text)
+
+    starts = [start for start, _ in offsets]
+    attributions = [0.0] * len(tokens)
+    for start, end, contribution in contributions:
+        index = bisect_right(starts, start) - 1
+        if index >= 0 and end <= offsets[index][1]:
+            attributions[index] += contribution
+    return {"severity": int(severity), "attributions": attributions}
@@ -1,35 +1,80 @@
-import numpy as np
-import pandas as pd
+import os
 import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import classification_report
+import threading
+from functools import lru_cache
 
-# Function to normalize profanity replacements
-def normalize_word(word):
-    replacements = {
-        '@': 'a', '1': 'i', '!': 'i', '3': 'e', '0': 'o', '7': 't', '9': 'g',
-        r'\|\|': 'n', r'\|\\\|': 'n', r'/\|/': 'n', r'/\\/': 'n', r'/\/': 'n',
-        r'\\': 'l', r'\(': 'c', r'\)': 'c', '5': 's',
-        r'\/\/': 'w', r'\\\/': 'w', r'\|/': 'w', r'vv': 'w'
-    }
-    
+# Leetspeak replacements, applied in order by normalize_word
+REPLACEMENTS = {
+    '@': 'a', '1': 'i', '!': 'i', '3': 'e', '0': 'o', '7': 't', '9': 'g',
+    r'\|\|': 'n', r'\|\\\|': 'n', r'/\|/': 'n', r'/\\/': 'n', r'/\/': 'n',
+    r'\\': 'l', r'\(': 'c', r'\)': 'c', '5': 's',
+    r'\/\/': 'w', r'\\\/': 'w', r'\|/': 'w', r'vv': 'w'
+}
+
+# Common misspellings
+CORRECTIONS = {
+    'fukc': 'fuck', 'sh1t': 'shit', 'f@ck': 'fuck', 'd@mn': 'damn'
+}
+
+# Function to normalize profanity replacements (the original regex loop; normalize_word must match it exactly)
+def normalize_word_reference(word):
     # Apply replacements
-    for key, val in replacements.items():
+    for key, val in REPLACEMENTS.items():
         word = re.sub(key, val, word)
-    #print(f"After replacements: {word}")
     # Handle repeated characters (e.g., fuuuuck -> fuck)
     word = re.sub(r'[\_\-]+', '', word)
     word = re.sub(r'\s+', ' ', word).strip()
     word = re.sub(r'(.)\1{2,}', r'\1', word)
-    #print(f"After removing repeated characters: {word}")
-    # Common misspellings
-    corrections = {
-        'fukc': 'fuck', 'sh1t': 'shit', 'f@ck': 'fuck', 'd@mn': 'damn'
-    }
-    
-    return corrections.get(word, word)
+    return CORRECTIONS.get(word, word)
+
+# Compiled form of REPLACEMENTS. Every replacement turns symbols into a letter, and the
+# multi-character ones only contain |, / and \, so each maximal run of those characters
+# can be rewritten on its own, and the single-character ones can be applied at once.
+def replacement_literal(key):
+    return re.sub(r'\\(.)', r'\1', key)
+
+SEQUENCE_CHARACTERS = '|/\\'
+SEQUENCE_RUN = re.compile(r'[|/\\]+')
+LEET_TABLE = str.maketrans({replacement_literal(key): val for key, val in REPLACEMENTS.items()
+                            if len(replacement_literal(key)) == 1 and replacement_literal(key) not in SEQUENCE_CHARACTERS})
+SEQUENCE_REPLACEMENTS = [(re.compile(key), val) for key, val in REPLACEMENTS.items()
+                         if all(char in SEQUENCE_CHARACTERS for char in replacement_literal(key))]
+OTHER_REPLACEMENTS = [(replacement_literal(key), val) for key, val in REPLACEMENTS.items()
+                      if len(replacement_literal(key)) > 1 and not any(char in SEQUENCE_CHARACTERS for char in replacement_literal(key))]
+SEPARATORS_TABLE = str.maketrans('', '', '_-')
+REPEATED_CHARACTERS = re.compile(r'(.)\1{2,}')
+
+@lru_cache(maxsize=4096)
+def replace_sequence(run):
+    # The multi-character replacements, in order, on one run of |, / and \
+    for pattern, val in SEQUENCE_REPLACEMENTS:
+        run = pattern.sub(val, run)
+    return run
+
+def replace_sequence_match(match):
+    return replace_sequence(match.group())
+
+# Function to normalize profanity replacements
+def normalize_word(word):
+    # Apply replacements: single characters, then runs of |, / and \, then the rest (vv)
+    word = word.translate(LEET_TABLE)
+    if '|' in word or '/' in word or '\\' in word:
+        word = SEQUENCE_RUN.sub(replace_sequence_match, word)
+    for key, val in OTHER_REPLACEMENTS:
+        word = word.replace(key, val)
+    # Handle repeated characters (e.g., fuuuuck -> fuck)
+    word = word.translate(SEPARATORS_TABLE)
+    word = ' '.join(word.split())
+    word = REPEATED_CHARACTERS.sub(r'\1', word)
+    return CORRECTIONS.get(word, word)
+
+# Function to normalize many words at once, each distinct word once
+def normalize_many(words):
+    normalized = {}
+    for word in words:
+        if word not in normalized:
+            normalized[word] = normalize_word(word)
+    return [normalized[word] for word in words]
 
 # Sample dataset (Word, Severity Level)
 data = [
@@ -83,36 +128,48 @@ data = [
     ("play", 0),
 ]
 
-# Normalize dataset
-df = pd.DataFrame(data, columns=["word", "severity"])
-df["normalized"] = df["word"].apply(normalize_word)
+# The model is trained by train.py and loaded from its exported artifacts on first use
+severity_model = None
+severity_model_lock = threading.Lock()
 
-# Feature extraction using TF-IDF vectorizer
-vectorizer = TfidfVectorizer(ngram_range=(1,2), analyzer='char')
-X = vectorizer.fit_transform(df["normalized"])
-y = df["severity"]
+# Serve with hashed features bounded to this many buckets instead of the exact vocabulary (0 = exact)
+SEVERITY_HASH_BUCKETS = int(os.getenv("SEVERITY_HASH_BUCKETS", "0"))
+# Coefficient encoding to serve: "float64" (exact), "float32" or "int8"; train.py reports the accuracy of each
+SEVERITY_WEIGHTS = os.getenv("SEVERITY_WEIGHTS", "float64")
 
-# Train/test split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Train a logistic regression model
-model = LogisticRegression(max_iter=1000)
-model.fit(X_train, y_train)
-
-# Predictions
-y_pred = model.predict(X_test)
-
-# Evaluation
-print(classification_report(y_test, y_pred))
+# Function to load the exported severity model once per process; run train.py to export it
+def get_severity_model():
+    global severity_model
+    if severity_model is None:
+        with severity_model_lock:
+            if severity_model is None:
+                from model_artifacts import require_artifacts
+                from ngram_model import NgramLinearModel
+                artifacts = require_artifacts("severity", weights=SEVERITY_WEIGHTS, vocabulary=bool(SEVERITY_HASH_BUCKETS))
+                if artifacts["normalization"] != {"replacements": REPLACEMENTS, "corrections": CORRECTIONS}:
+                    print("Warning: severity model was trained with a different normalization table.")
+                severity_model = NgramLinearModel(artifacts, SEVERITY_HASH_BUCKETS or None)
+    return severity_model
 
 # Function to predict severity of new words
 def predict_severity(word):
     normalized_word = normalize_word(word)
-    word_vec = vectorizer.transform([normalized_word])
-    severity = model.predict(word_vec)[0]
+    severity = get_severity_model().predict([normalized_word])[0]
     return {"original": word, "normalized": normalized_word, "severity": severity}
 
-# Example usage
-print(predict_severity("|\|igga"))
+# Function to predict severity of already normalized words in one model call
+def predict_normalized_many(normalized_words):
+    if not normalized_words:
+        return []
+    return get_severity_model().predict(normalized_words)
+
+# Function to predict severity of many words with one transform and one predict call
+def predict_severity_many(words):
+    if not words:
+        return []
+    normalized_words = normalize_many(words)
+    severities = predict_normalized_many(normalized_words)
+    return [{"original": word, "normalized": normalized_word, "severity": severity}
+            for word, normalized_word, severity in zip(words, normalized_words, severities)]
 
-# TODO: have to sync up the data in here with the data in the supabase database
\ No newline at end of file
+# TODO: have to sync up the data in here with the data in the supabase database
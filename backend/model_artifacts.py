@@ -0,0 +1,167 @@
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+from ngram_model import ngram_code
+
+# Trained models live in <ARTIFACTS_DIR>/<name>/<version>/, with <name>/LATEST naming the one to serve
+ARTIFACTS_DIR = os.getenv("MODEL_ARTIFACTS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"))
+
+# Vectorizer settings needed to rebuild the features at serving time
+VECTORIZER_PARAMS = ("analyzer", "ngram_range", "lowercase", "token_pattern", "norm", "use_idf", "smooth_idf", "sublinear_tf")
+
+# Coefficient encodings exported for serving: exact, half the size, or an eighth of the size
+WEIGHT_DTYPES = ("float64", "float32", "int8")
+
+
+def save_artifacts(name: str, vectorizer, model, normalization: dict = None) -> str:
+    """
+    Writes a fitted TF-IDF vectorizer and linear model as versioned artifacts:
+    the vocabulary, IDF weights, coefficients, intercepts, label set and the
+    normalization table the training data went through. Returns the version.
+
+    For serving it also writes the compact n-gram table (sorted 64-bit n-gram
+    codes and their feature columns) and the coefficients as float32 and as
+    int8 with a per-class scale.
+    """
+    # Timestamp for readability plus a random suffix, so concurrent exports never share a directory
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    model_dir = os.path.join(ARTIFACTS_DIR, name)
+    final_dir = os.path.join(model_dir, version)
+    # Files are written to a temporary directory that is renamed into place once complete
+    version_dir = os.path.join(model_dir, f".tmp-{version}")
+    os.makedirs(version_dir)
+    try:
+        write_version(version_dir, name, version, vectorizer, model, normalization)
+        os.rename(version_dir, final_dir)
+    except BaseException:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    # Point LATEST at the new version last, so a half-written version is never served
+    latest_path = os.path.join(model_dir, "LATEST")
+    temporary_path = f"{latest_path}.{version}.tmp"
+    with open(temporary_path, "w") as file:
+        file.write(version)
+    os.replace(temporary_path, latest_path)
+    return version
+
+
+def write_version(version_dir: str, name: str, version: str, vectorizer, model, normalization: dict):
+
+    params = vectorizer.get_params()
+    manifest = {
+        "name": name,
+        "version": version,
+        "vectorizer": {param: params[param] for param in VECTORIZER_PARAMS},
+        "classes": [label.item() if hasattr(label, "item") else label for label in model.classes_],
+    }
+    with open(os.path.join(version_dir, "manifest.json"), "w") as file:
+        json.dump(manifest, file, indent=2)
+    with open(os.path.join(version_dir, "vocabulary.json"), "w") as file:
+        json.dump({ngram: int(column) for ngram, column in vectorizer.vocabulary_.items()}, file)
+    with open(os.path.join(version_dir, "normalization.json"), "w") as file:
+        json.dump(normalization or {}, file, indent=2)
+    np.save(os.path.join(version_dir, "idf.npy"), vectorizer.idf_)
+    np.save(os.path.join(version_dir, "coef.npy"), model.coef_)
+    np.save(os.path.join(version_dir, "coef_float32.npy"), model.coef_.astype(np.float32))
+    scale = np.abs(model.coef_).max(axis=1) / 127
+    scale[scale == 0] = 1
+    np.save(os.path.join(version_dir, "coef_int8.npy"), np.round(model.coef_ / scale[:, None]).astype(np.int8))
+    np.save(os.path.join(version_dir, "coef_scale.npy"), scale)
+
+    ngrams = list(vectorizer.vocabulary_)
+    codes = np.array([ngram_code(ngram) for ngram in ngrams], dtype=np.uint64)
+    order = np.argsort(codes)
+    if len(np.unique(codes)) != len(codes):
+        raise ValueError(f"N-gram code collision in the {name} vocabulary")
+    np.save(os.path.join(version_dir, "ngram_codes.npy"), codes[order])
+    np.save(os.path.join(version_dir, "ngram_columns.npy"),
+            np.array([vectorizer.vocabulary_[ngrams[index]] for index in order], dtype=np.int32))
+    np.save(os.path.join(version_dir, "intercept.npy"), model.intercept_)
+
+
+def latest_version(name: str):
+    """
+    Returns the version LATEST points to, or None if the model was never exported.
+    """
+    try:
+        with open(os.path.join(ARTIFACTS_DIR, name, "LATEST")) as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def require_artifacts(name: str, weights: str = "float64", vocabulary: bool = False) -> dict:
+    """
+    Loads the served version of a model, failing fast when none was exported:
+    models are trained by train.py at build time, never on a live request.
+    """
+    artifacts = load_artifacts(name, weights=weights, vocabulary=vocabulary)
+    if artifacts is None:
+        raise RuntimeError(f"No {name} model artifacts in {ARTIFACTS_DIR}. Run `python train.py` first.")
+    return artifacts
+
+
+def load_artifacts(name: str, version: str = None, weights: str = "float64", vocabulary: bool = False) -> dict:
+    """
+    Loads exported artifacts. Arrays are memory-mapped read-only, so worker
+    processes share the pages instead of each holding a copy. Serving looks
+    n-grams up in the compact table; the vocabulary dict is only loaded when
+    asked for (sklearn rebuilds and feature hashing need the n-gram strings).
+    """
+    if weights not in WEIGHT_DTYPES:
+        raise ValueError(f"Unknown weights {weights!r}, expected one of {WEIGHT_DTYPES}")
+    version = version or latest_version(name)
+    if version is None:
+        return None
+    version_dir = os.path.join(ARTIFACTS_DIR, name, version)
+
+    def load_array(file_name):
+        return np.load(os.path.join(version_dir, file_name), mmap_mode="r")
+
+    with open(os.path.join(version_dir, "manifest.json")) as file:
+        manifest = json.load(file)
+    with open(os.path.join(version_dir, "normalization.json")) as file:
+        normalization = json.load(file)
+    artifacts = {
+        "manifest": manifest,
+        "normalization": normalization,
+        "idf": load_array("idf.npy"),
+        "coef": load_array("coef.npy" if weights == "float64" else f"coef_{weights}.npy"),
+        "coef_scale": load_array("coef_scale.npy") if weights == "int8" else None,
+        "intercept": load_array("intercept.npy"),
+        "ngram_codes": load_array("ngram_codes.npy"),
+        "ngram_columns": load_array("ngram_columns.npy"),
+        "vocabulary": None,
+    }
+    if vocabulary:
+        with open(os.path.join(version_dir, "vocabulary.json")) as file:
+            artifacts["vocabulary"] = json.load(file)
+    return artifacts
+
+
+def build_model(artifacts: dict):
+    """
+    Rebuilds the sklearn vectorizer and model from artifacts by setting their
+    fitted attributes directly; nothing is fitted. Serving uses
+    ngram_model.NgramLinearModel instead; this is the reference it is checked against.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    params = dict(artifacts["manifest"]["vectorizer"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = artifacts["vocabulary"]
+    vectorizer.idf_ = artifacts["idf"]
+
+    model = LogisticRegression()
+    model.coef_ = np.asarray(artifacts["coef"], dtype=np.float64)
+    if artifacts["coef_scale"] is not None:
+        model.coef_ = model.coef_ * artifacts["coef_scale"][:, None]
+    model.intercept_ = artifacts["intercept"]
+    model.classes_ = np.array(artifacts["manifest"]["classes"])
+    return vectorizer, model
@@ -0,0 +1,207 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+
+# Same whitespace collapsing sklearn's char analyzer applies before extracting n-grams
+WHITE_SPACES = re.compile(r"\s\s+")
+
+
+def ngram_code(ngram: str) -> int:
+    """
+    64-bit code identifying an n-gram in the compact n-gram table.
+    """
+    return int.from_bytes(hashlib.blake2b(ngram.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def feature_bucket(ngram: str, hash_buckets: int) -> int:
+    """
+    Stable bucket for an n-gram (crc32, unlike hash(), is the same in every process).
+    """
+    return zlib.crc32(ngram.encode("utf-8")) % hash_buckets
+
+
+class NgramLinearModel:
+    """
+    NumPy-only inference for an exported TF-IDF + logistic regression model:
+    n-gram extraction, a feature lookup, IDF weighting, L2 normalization and
+    one dot product per token. Reproduces sklearn's transform/predict
+    without importing sklearn.
+
+    N-grams are looked up by binary search in the compact n-gram table, and
+    the coefficients may be float32 or int8 (dequantized per lookup), so
+    every array stays memory-mapped and shared between worker processes.
+
+    With hash_buckets set, n-grams are looked up by hashed bucket instead,
+    so memory is bounded no matter how large the vocabulary grows. Colliding
+    n-grams share a bucket, so predictions are then approximate; train.py
+    reports how often they still agree.
+    """
+
+    def __init__(self, artifacts: dict, hash_buckets: int = None):
+        params = artifacts["manifest"]["vectorizer"]
+        if params["analyzer"] not in ("char", "word"):
+            raise ValueError(f"Unsupported analyzer: {params['analyzer']}")
+        self.analyzer = params["analyzer"]
+        self.min_n, self.max_n = params["ngram_range"]
+        self.lowercase = params["lowercase"]
+        self.token_pattern = re.compile(params["token_pattern"]) if params["token_pattern"] else None
+        self.norm = params["norm"]
+        self.sublinear_tf = params["sublinear_tf"]
+        self.classes = np.array(artifacts["manifest"]["classes"])
+
+        idf = artifacts["idf"] if params["use_idf"] else None
+        coef = artifacts["coef"]
+        self.coef_scale = artifacts["coef_scale"]
+        self.intercept = np.asarray(artifacts["intercept"], dtype=np.float64)
+        self.ngram_codes = artifacts["ngram_codes"]
+        self.ngram_columns = artifacts["ngram_columns"]
+        self.hash_buckets = hash_buckets
+        if hash_buckets:
+            # Fold every vocabulary column into its bucket; empty buckets have zero weight,
+            # so unseen n-grams that land there are ignored just like out-of-vocabulary ones
+            vocabulary = artifacts["vocabulary"]
+            if vocabulary is None:
+                raise ValueError("Feature hashing needs the artifacts loaded with their vocabulary")
+            columns = np.fromiter(vocabulary.values(), dtype=np.int64, count=len(vocabulary))
+            buckets = np.fromiter((feature_bucket(ngram, hash_buckets) for ngram in vocabulary),
+                                  dtype=np.int64, count=len(columns))
+            folded_coef = np.zeros((coef.shape[0], hash_buckets))
+            np.add.at(folded_coef.T, buckets, coef[:, columns].T)
+            coef = folded_coef
+            if idf is not None:
+                folded_idf = np.zeros(hash_buckets)
+                np.maximum.at(folded_idf, buckets, idf[columns])
+                idf = folded_idf
+        self.idf = idf
+        self.coef = coef
+        self.n_features = coef.shape[1]
+
+    def analyze(self, text: str) -> list:
+        """
+        The n-grams sklearn's analyzer extracts from text.
+        """
+        if self.lowercase:
+            text = text.lower()
+        if self.analyzer == "char":
+            text = WHITE_SPACES.sub(" ", text)
+            return [text[i:i + n]
+                    for n in range(self.min_n, min(self.max_n, len(text)) + 1)
+                    for i in range(len(text) - n + 1)]
+        tokens = self.token_pattern.findall(text)
+        return [" ".join(tokens[i:i + n])
+                for n in range(self.min_n, min(self.max_n, len(tokens)) + 1)
+                for i in range(len(tokens) - n + 1)]
+
+    def lookup(self, ngrams: list) -> np.ndarray:
+        """
+        Feature column of each n-gram, or -1 for n-grams outside the vocabulary.
+        """
+        if self.hash_buckets:
+            return np.fromiter((feature_bucket(ngram, self.hash_buckets) for ngram in ngrams),
+                               dtype=np.int64, count=len(ngrams))
+        codes = np.fromiter(map(ngram_code, ngrams), dtype=np.uint64, count=len(ngrams))
+        positions = np.searchsorted(self.ngram_codes, codes)
+        positions[positions == len(self.ngram_codes)] = 0
+        found = self.ngram_codes[positions] == codes
+        return np.where(found, self.ngram_columns[positions], -1)
+
+    def decision_function(self, texts: list) -> np.ndarray:
+        """
+        Class scores for each text, as LogisticRegression.decision_function returns them.
+        """
+        rows, ngrams = [], []
+        for row, text in enumerate(texts):
+            text_ngrams = self.analyze(text)
+            rows.extend([row] * len(text_ngrams))
+            ngrams.extend(text_ngrams)
+        columns = self.lookup(ngrams)
+        known = columns >= 0
+
+        # One (row, column) key per occurrence; np.unique sorts them and counts repeats,
+        # leaving each row's columns in the ascending order sklearn sums a sparse row in
+        keys, counts = np.unique(np.array(rows, dtype=np.int64)[known] * self.n_features + columns[known],
+                                 return_counts=True)
+        rows, columns = np.divmod(keys, self.n_features)
+        values = counts.astype(np.float64)
+
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.idf is not None:
+            values = values * self.idf[columns]
+        if self.norm == "l2":
+            norms = np.sqrt(np.bincount(rows, weights=values * values, minlength=len(texts)))
+            norms[norms == 0] = 1
+            values = values / norms[rows]
+        elif self.norm == "l1":
+            norms = np.bincount(rows, weights=np.abs(values), minlength=len(texts))
+            norms[norms == 0] = 1
+            values = values / norms[rows]
+
+        # Sum each row's contributions; rows are contiguous since the keys are sorted
+        scores = np.zeros((len(texts), self.coef.shape[0]))
+        if len(rows):
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            weights = self.coef[:, columns].astype(np.float64)
+            if self.coef_scale is not None:
+                weights *= self.coef_scale[:, None]
+            scores[rows[starts]] = np.add.reduceat((weights * values).T, starts, axis=0)
+        scores += self.intercept
+        return scores[:, 0] if scores.shape[1] == 1 else scores
+
+    def explain(self, text: str):
+        """
+        Scores one text and attributes the predicted class's margin over the
+        first class (e.g. severity 0) to the n-gram occurrences that produced
+        it: positive contributions push the text towards the prediction.
+        Char analyzer only; positions index the lowercased text, so pass text
+        without runs of whitespace.
+        Returns (predicted class, [(start, end, contribution)]).
+        """
+        if self.analyzer != "char":
+            raise ValueError("Attributions need a char analyzer")
+        if self.lowercase:
+            text = text.lower()
+        if WHITE_SPACES.search(text):
+            raise ValueError("Text must not contain runs of whitespace")
+        positions = [(i, i + n)
+                     for n in range(self.min_n, min(self.max_n, len(text)) + 1)
+                     for i in range(len(text) - n + 1)]
+        columns = self.lookup([text[start:end] for start, end in positions])
+        known = np.flatnonzero(columns >= 0)
+        columns, occurrence_columns, counts = np.unique(columns[known], return_inverse=True, return_counts=True)
+
+        values = counts.astype(np.float64)
+        if self.sublinear_tf:
+            values = np.log(values) + 1
+        if self.idf is not None:
+            values = values * self.idf[columns]
+        if self.norm == "l2" and len(values):
+            values = values / (np.sqrt(np.dot(values, values)) or 1)
+        elif self.norm == "l1" and len(values):
+            values = values / (np.abs(values).sum() or 1)
+
+        weights = self.coef[:, columns].astype(np.float64)
+        if self.coef_scale is not None:
+            weights *= self.coef_scale[:, None]
+        scores = (weights * values).sum(axis=1) + self.intercept
+        if len(scores) == 1:
+            # Binary model: one score, positive for the second class
+            predicted = int(scores[0] > 0)
+            class_weights = weights[0] if predicted else -weights[0]
+        else:
+            predicted = int(scores.argmax())
+            class_weights = weights[predicted] - weights[0]
+
+        # Split each column's contribution evenly over its occurrences
+        contributions = (values * class_weights / counts)[occurrence_columns]
+        return self.classes[predicted], [(positions[index][0], positions[index][1], float(contribution))
+                                         for index, contribution in zip(known, contributions)]
+
+    def predict(self, texts: list) -> np.ndarray:
+        if not texts:
+            return self.classes[:0]
+        scores = self.decision_function(texts)
+        if scores.ndim == 1:
+            return self.classes[(scores > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
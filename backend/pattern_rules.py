@@ -0,0 +1,235 @@
+import os
+import re
+import threading
+import regex
+
+try:
+    from re import _parser as sre_parse
+    from re._constants import MAXREPEAT
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import MAXREPEAT
+
+# Bounds on a company's pattern rules; each rule runs on every message of the company
+MAX_PATTERNS = int(os.getenv("MAX_PATTERNS", "100"))
+MAX_PATTERN_LENGTH = int(os.getenv("MAX_PATTERN_LENGTH", "200"))
+
+# Longest a message's scan may take before the rules are given up for that message
+PATTERN_TIMEOUT = float(os.getenv("PATTERN_TIMEOUT_MS", "50")) / 1000
+
+REPEATS = {"MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"}
+BACKREFERENCES = {"GROUPREF", "GROUPREF_EXISTS"}
+ZERO_WIDTH = {"AT", "ASSERT", "ASSERT_NOT"}
+
+# Characters used to tell whether two repeated character classes can match the same text
+SAMPLE_CHARACTERS = [chr(code) for code in range(32, 127)] + list("\t\n\u00a0\u00e9\u00df\u0430\u4e2d\u0661")
+CATEGORIES = {
+    "CATEGORY_DIGIT": str.isdigit, "CATEGORY_NOT_DIGIT": lambda char: not char.isdigit(),
+    "CATEGORY_SPACE": str.isspace, "CATEGORY_NOT_SPACE": lambda char: not char.isspace(),
+    "CATEGORY_WORD": lambda char: char.isalnum() or char == "_",
+    "CATEGORY_NOT_WORD": lambda char: not (char.isalnum() or char == "_"),
+}
+
+
+def pattern_problem(pattern: str):
+    """
+    Returns why a pattern is rejected, or None when it may run.
+    Rejects the shapes that backtrack badly: a variable-length repeat inside
+    another repeat ((a+)+, (a{1,30}){1,30}; fixed ones like (\\d{3}-){2} are
+    fine), alternatives inside a repeat that can start with the same
+    character ((a|ab)*), and unbounded repeats in a row that can match the
+    same characters (.*.*x, \\w+\\s?\\w+), plus backreferences. This is a
+    heuristic, so every scan also runs under PATTERN_TIMEOUT. Named groups
+    would clash with the per-rule groups of the combined pattern.
+    """
+    if not pattern:
+        return "empty pattern"
+    if len(pattern) > MAX_PATTERN_LENGTH:
+        return f"longer than {MAX_PATTERN_LENGTH} characters"
+    try:
+        parsed = sre_parse.parse(pattern, re.IGNORECASE)
+        problem = subpattern_problem(parsed, False) or sequence_problem(parsed)
+        if problem:
+            return problem
+        compiled = regex.compile(f"(?P<rule0>{pattern})")
+    except (re.error, regex.error, RecursionError) as e:
+        return f"invalid pattern: {e}"
+    if len(compiled.groupindex) > 1:
+        return "named groups are not allowed"
+    return None
+
+
+def subpattern_problem(items, in_repeat: bool):
+    """
+    Checks for backreferences, and for variable-length repeats or overlapping
+    alternatives nested in a repeat: those let the outer repeat split the
+    same text between its iterations in many ways.
+    """
+    for op, value in items:
+        name = str(op)
+        if name in BACKREFERENCES:
+            return "backreferences are not allowed"
+        if name in REPEATS:
+            low, high, body = value
+            if low != high and in_repeat:
+                return "variable-length repeats inside a repeat are not allowed"
+            problem = subpattern_problem(body, in_repeat or high > 1)
+        elif name == "BRANCH":
+            if in_repeat and branches_overlap(value[1]):
+                return "alternatives that start alike inside a repeat are not allowed"
+            problem = next(filter(None, (subpattern_problem(branch, in_repeat) for branch in value[1])), None)
+        elif name == "SUBPATTERN":
+            problem = subpattern_problem(value[-1], in_repeat)
+        elif name in ("ASSERT", "ASSERT_NOT"):
+            problem = subpattern_problem(value[1], in_repeat)
+        elif name == "ATOMIC_GROUP":
+            problem = subpattern_problem(value, in_repeat)
+        else:
+            problem = None
+        if problem:
+            return problem
+    return None
+
+
+def branches_overlap(branches) -> bool:
+    """
+    Whether two alternatives can start with the same character; an empty
+    alternative counts as starting with anything.
+    """
+    seen = []
+    for branch in branches:
+        characters = body_characters(list(flatten(branch))[:1])
+        if any(characters & earlier for earlier in seen):
+            return True
+        seen.append(characters)
+    return False
+
+
+def sequence_problem(items):
+    """
+    Checks for unbounded repeats that follow one another with nothing between
+    them that only one of them can match, e.g. .*.*, \\d+\\s*\\d+ or .*a.*:
+    each pair multiplies the ways the same text can be split between them.
+    """
+    pending = []  # Characters each earlier unbounded repeat can match, while still unseparated
+    for op, value in flatten(items):
+        name = str(op)
+        if name in ZERO_WIDTH:
+            continue
+        if name == "BRANCH":
+            problem = next(filter(None, (sequence_problem(branch) for branch in value[1])), None)
+            if problem:
+                return problem
+            pending = []
+            continue
+        if name in REPEATS:
+            low, high, body = value
+            characters = body_characters(body)
+            if high == MAXREPEAT:
+                if any(characters & earlier for earlier in pending):
+                    return "unbounded repeats in a row that match the same characters are not allowed"
+                pending.append(characters)
+                continue
+            if low == 0:
+                continue  # Optional: separates nothing
+        else:
+            characters = body_characters([(op, value)])
+        # A separator only stops the earlier repeats that cannot also match it
+        pending = [earlier for earlier in pending if earlier & characters]
+    return None
+
+
+def flatten(items):
+    for op, value in items:
+        if str(op) == "SUBPATTERN":
+            yield from flatten(value[-1])
+        else:
+            yield op, value
+
+
+def body_characters(body) -> frozenset:
+    """
+    The sample characters a repeated body can start with; anything longer than
+    one character class counts as matching every character.
+    """
+    body = list(flatten(body))
+    if len(body) != 1:
+        return frozenset(SAMPLE_CHARACTERS)
+    op, value = body[0]
+    return frozenset(char for char in SAMPLE_CHARACTERS if item_matches(str(op), value, char))
+
+
+def item_matches(name: str, value, char: str) -> bool:
+    """
+    Whether a one-character item matches char, ignoring case.
+    """
+    if name == "LITERAL":
+        return chr(value).lower() == char.lower()
+    if name == "NOT_LITERAL":
+        return chr(value).lower() != char.lower()
+    if name == "ANY":
+        return char != "\n"
+    if name == "IN":
+        negate = any(str(op) == "NEGATE" for op, _ in value)
+        found = any(class_item_matches(str(op), item, char) for op, item in value if str(op) != "NEGATE")
+        return found != negate
+    return True  # Unknown items are assumed to overlap with everything
+
+
+def class_item_matches(name: str, value, char: str) -> bool:
+    if name == "LITERAL":
+        return chr(value).lower() == char.lower()
+    if name == "RANGE":
+        return any(value[0] <= ord(variant) <= value[1] for variant in (char, char.lower(), char.upper())
+                   if len(variant) == 1)
+    if name == "CATEGORY":
+        return CATEGORIES.get(str(value), lambda char: True)(char)
+    return True
+
+
+class PatternRules:
+    """
+    A company's pattern rules (URL shorteners, phone numbers, \\bk+y+s+\\b)
+    compiled into one case-insensitive alternation with a named group per
+    rule, so a message is scanned once whatever the number of rules.
+    Rules that fail the complexity guard are left out and kept in rejected;
+    a scan that still runs past PATTERN_TIMEOUT is cut short and counted.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self.rejected = {}  # pattern -> reason
+        self.timeouts = 0
+        self.lock = threading.Lock()  # Scans run on many request threads at once
+        for pattern in dict.fromkeys(patterns or []):
+            problem = pattern_problem(pattern)
+            if problem is None and len(self.patterns) >= MAX_PATTERNS:
+                problem = f"more than {MAX_PATTERNS} patterns"
+            if problem is None:
+                self.patterns.append(pattern)
+            else:
+                print(f"Skipping pattern rule {pattern!r}: {problem}")
+                self.rejected[pattern] = problem
+        combined = "|".join(f"(?P<rule{index}>{pattern})" for index, pattern in enumerate(self.patterns))
+        self.regex = regex.compile(combined, regex.IGNORECASE | regex.VERSION0) if self.patterns else None
+
+    def find_all(self, text: str) -> list:
+        """
+        Returns (start, end, pattern) for every non-empty match in text. A scan
+        that times out keeps the matches found before it stopped.
+        """
+        if self.regex is None:
+            return []
+        matches = []
+        try:
+            for match in self.regex.finditer(text, timeout=PATTERN_TIMEOUT):
+                if match.end() > match.start():
+                    matches.append((match.start(), match.end(), self.patterns[int(match.lastgroup[4:])]))
+        except TimeoutError:
+            with self.lock:
+                self.timeouts += 1
+            print(f"Pattern rules timed out on a message of {len(text)} characters")
+        return matches
+
+    def __len__(self):
+        return len(self.patterns)
@@ -0,0 +1,56 @@
+# Rolling hash over token hashes, modulo a Mersenne prime
+HASH_BASE = 1000003
+HASH_MODULUS = (1 << 61) - 1
+
+
+def phrase_hash(token_hashes) -> int:
+    value = 0
+    for token_hash in token_hashes:
+        value = (value * HASH_BASE + token_hash) % HASH_MODULUS
+    return value
+
+
+class PhraseIndex:
+    """
+    Multi-word banned phrases ("alabama hot pocket") keyed by a rolling hash
+    of their normalized tokens. A message is scanned from every token for at
+    most the longest phrase length, so matching costs at most tokens times
+    max phrase length hash probes. Hashes of phrase prefixes are kept too,
+    so a scan stops as soon as no phrase starts the way the message does.
+    """
+
+    def __init__(self, phrases: dict):
+        # phrases: {tuple of normalized tokens: phrase as listed}
+        self.phrases = {}  # hash -> [(tokens, phrase)]
+        self.prefixes = set()
+        self.max_length = 0
+        for tokens, phrase in phrases.items():
+            token_hashes = [hash(token) for token in tokens]
+            for length in range(1, len(tokens)):
+                self.prefixes.add(phrase_hash(token_hashes[:length]))
+            self.phrases.setdefault(phrase_hash(token_hashes), []).append((tokens, phrase))
+            self.max_length = max(self.max_length, len(tokens))
+
+    def find_all(self, tokens: list) -> list:
+        """
+        Returns (first token index, last token index + 1, phrase) for every
+        phrase found in the normalized tokens of a message.
+        """
+        if not self.phrases:
+            return []
+        token_hashes = [hash(token) for token in tokens]
+        matches = []
+        for start in range(len(tokens)):
+            value = 0
+            for end in range(start, min(len(tokens), start + self.max_length)):
+                value = (value * HASH_BASE + token_hashes[end]) % HASH_MODULUS
+                for phrase_tokens, phrase in self.phrases.get(value, ()):
+                    # Confirm the tokens, since different phrases can share a hash
+                    if len(phrase_tokens) == end + 1 - start and list(phrase_tokens) == tokens[start:end + 1]:
+                        matches.append((start, end + 1, phrase))
+                if value not in self.prefixes:
+                    break
+        return matches
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.phrases.values())
@@ -0,0 +1,83 @@
+import threading
+from model2 import normalize_many, predict_normalized_many
+
+
+def dataset_terms() -> list:
+    """
+    The words the models were trained on: model.py's banned and negative words
+    and model2.py's labelled words.
+    """
+    from model import data as profanity_data
+    from model2 import data as severity_data
+    return profanity_data["word"] + [word for word, _ in severity_data]
+
+
+class SeverityTable:
+    """
+    Precomputed severity of every known term, keyed by its normalized form,
+    so the model only runs for out-of-vocabulary tokens.
+
+    Terms come from named sources (the training data, the global list, each
+    company's custom list). Updating a source only scores the normalized
+    forms that are new to the table and drops the ones no source holds anymore.
+    """
+
+    def __init__(self):
+        self.severities = {}  # normalized term -> severity
+        self.holders = {}  # normalized term -> number of sources holding it
+        self.sources = {}  # source -> (words, normalized terms)
+        self.lock = threading.Lock()
+
+    def update_source(self, source, words):
+        with self.lock:
+            previous_words, previous_terms = self.sources.get(source, (None, frozenset()))
+            if previous_words is words or previous_words == words:
+                return
+            terms = frozenset(normalize_many(list(words)))
+
+            new_terms = [term for term in terms - previous_terms if term not in self.holders]
+            for term, severity in zip(new_terms, predict_normalized_many(new_terms)):
+                self.severities[term] = severity
+            for term in terms - previous_terms:
+                self.holders[term] = self.holders.get(term, 0) + 1
+            for term in previous_terms - terms:
+                self.holders[term] -= 1
+                if not self.holders[term]:
+                    del self.holders[term]
+                    del self.severities[term]
+            self.sources[source] = (words, terms)
+
+    def remove_source(self, source):
+        """
+        Drops a source, and the terms no other source holds.
+        """
+        with self.lock:
+            _, terms = self.sources.pop(source, (None, frozenset()))
+            for term in terms:
+                self.holders[term] -= 1
+                if not self.holders[term]:
+                    del self.holders[term]
+                    del self.severities[term]
+
+    def predict_many(self, words: list) -> list:
+        """
+        Same output as model2.predict_severity_many: known terms are read from
+        the table and the rest are scored in one model call.
+        """
+        normalized_words = normalize_many(words)
+        severities = [self.severities.get(normalized_word) for normalized_word in normalized_words]
+        unknown = [index for index, severity in enumerate(severities) if severity is None]
+        for index, severity in zip(unknown, predict_normalized_many([normalized_words[index] for index in unknown])):
+            severities[index] = severity
+        return [{"original": word, "normalized": normalized_word, "severity": severity}
+                for word, normalized_word, severity in zip(words, normalized_words, severities)]
+
+    def stats(self) -> dict:
+        return {"terms": len(self.severities), "sources": len(self.sources)}
+
+    def __len__(self):
+        return len(self.severities)
+
+
+# Severity of the training data and every loaded banned word list, shared by all requests of this worker
+known_severities = SeverityTable()
@@ -0,0 +1,165 @@
+import threading
+import time
+import pytest
+import cache
+from cache import TTLCache, TTLSnapshot
+
+
+class Loader:
+    def __init__(self, delay: float = 0.0):
+        self.calls = 0
+        self.delay = delay
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("database unavailable")
+        return frozenset(["word"])
+
+
+def test_concurrent_reads_share_one_load():
+    loader = Loader(delay=0.05)
+    snapshot = TTLSnapshot(loader, ttl=60, max_staleness=300)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(snapshot.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert loader.calls == 1
+    assert results == [(frozenset(["word"]), 1)] * 8
+
+
+def test_failed_refresh_keeps_the_load_time():
+    loader = Loader()
+    snapshot = TTLSnapshot(loader, ttl=0.01, max_staleness=300)
+    snapshot.get()
+    loaded_at = snapshot.state[2]
+    loader.fail = True
+    assert snapshot.refresh()[2] == loaded_at
+    assert snapshot.get() == (frozenset(["word"]), 1)
+
+
+def test_reads_fail_past_max_staleness():
+    loader = Loader()
+    snapshot = TTLSnapshot(loader, ttl=0.01, max_staleness=0.05)
+    snapshot.get()
+    loader.fail = True
+    time.sleep(0.06)
+    with pytest.raises(RuntimeError, match="No snapshot"):
+        snapshot.get()
+    loader.fail = False
+    assert snapshot.get() == (frozenset(["word"]), 1)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class CountingLoader:
+    def __init__(self, values: dict, release: threading.Event = None):
+        self.values = values
+        self.calls = 0
+        self.release = release
+        self.started = threading.Event()
+
+    def __call__(self, key):
+        self.calls += 1
+        self.started.set()
+        if self.release is not None:
+            self.release.wait(5)
+        value = self.values[key]
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_values_are_served_until_they_expire(clock):
+    loader = CountingLoader({"key": {"company_id": 1}})
+    companies = TTLCache(ttl=30, negative_ttl=10, max_entries=10)
+    assert companies.get_or_load("key", loader) == {"company_id": 1}
+    clock.now += 29
+    assert companies.get_or_load("key", loader) == {"company_id": 1}
+    assert loader.calls == 1
+    clock.now += 2
+    companies.get_or_load("key", loader)
+    assert loader.calls == 2
+
+
+def test_misses_are_cached_for_the_negative_ttl(clock):
+    loader = CountingLoader({"unknown": []})
+    companies = TTLCache(ttl=30, negative_ttl=10, max_entries=10)
+    assert companies.get_or_load("unknown", loader) == []
+    clock.now += 9
+    assert companies.get_or_load("unknown", loader) == []
+    assert loader.calls == 1
+    clock.now += 2
+    companies.get_or_load("unknown", loader)
+    assert loader.calls == 2
+
+
+def test_concurrent_misses_share_one_load(clock):
+    release = threading.Event()
+    loader = CountingLoader({"key": {"company_id": 1}}, release)
+    companies = TTLCache(ttl=30, negative_ttl=10, max_entries=10)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(companies.get_or_load("key", loader)))
+    leader.start()
+    assert loader.started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(companies.get_or_load("key", loader))) for _ in range(7)]
+    for thread in waiters:
+        thread.start()
+    release.set()
+    for thread in [leader] + waiters:
+        thread.join()
+    assert loader.calls == 1
+    assert results == [{"company_id": 1}] * 8
+
+
+def test_failed_loads_reach_every_waiter_and_are_not_cached(clock):
+    release = threading.Event()
+    loader = CountingLoader({"key": ConnectionError("database unavailable")}, release)
+    companies = TTLCache(ttl=30, negative_ttl=10, max_entries=10)
+    errors = []
+
+    def load():
+        try:
+            companies.get_or_load("key", loader)
+        except ConnectionError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=load)]
+    threads[0].start()
+    assert loader.started.wait(5)
+    threads += [threading.Thread(target=load) for _ in range(3)]
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 4 and loader.calls == 1
+
+    loader.values["key"] = {"company_id": 1}
+    assert companies.get_or_load("key", loader) == {"company_id": 1}
+    assert loader.calls == 2
+
+
+def test_oldest_entries_are_dropped_past_max_entries(clock):
+    loader = CountingLoader({"a": 1, "b": 2, "c": 3})
+    companies = TTLCache(ttl=30, negative_ttl=10, max_entries=2)
+    for key in ("a", "b", "a", "c"):
+        companies.get_or_load(key, loader)
+    assert list(companies.entries) == ["a", "c"]
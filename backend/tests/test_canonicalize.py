@@ -0,0 +1,24 @@
+import pytest
+from canonicalize import canonicalize, original_span
+from censor import apply_censor
+
+
+@pytest.mark.parametrize("text, word", [
+    ("fuck\u0301 you", "fuck"),  # combining accent after the last letter
+    ("you fu\u200bck\u0301\u0301", "fuck"),  # invisible character inside, two accents at the end of the text
+    ("\uff46\uff55\uff43\uff4b!", "fuck"),  # fullwidth letters
+    ("stra\u00dfe", "strasse"),  # one character folded to two
+])
+def test_spans_cover_the_whole_original_word(text, word):
+    canonical_text, offsets = canonicalize(text)
+    start = canonical_text.index(word)
+    original_start, original_end = original_span(offsets, start, start + len(word))
+    censored = apply_censor(text, [(original_start, original_end)])
+    assert censored == text[:original_start] + "*" * (original_end - original_start) + text[original_end:]
+    assert not any(char in "\u0301\u200b" for char in censored)
+    assert canonicalize(text[original_start:original_end])[0] == word
+
+
+def test_ascii_text_keeps_its_offsets():
+    assert canonicalize("hello") == ("hello", None)
+    assert original_span(None, 1, 3) == (1, 3)
@@ -0,0 +1,12 @@
+from censor import apply_censor, drop_covered, merge_spans
+
+
+def test_covered_matches_are_dropped():
+    matches = [(2, 3, "ass"), (4, 5, "ass"), (0, 5, "ass"), (0, 5, "a s s"), (6, 10, "fuck"), (8, 12, "cker")]
+    # Letters inside the spaced-out word go, the same span is reported once, partial overlaps stay
+    assert drop_covered(matches) == [(0, 5, "ass"), (6, 10, "fuck"), (8, 12, "cker")]
+
+
+def test_censoring_merges_overlapping_spans():
+    assert merge_spans([(6, 10), (0, 5), (8, 12), (5, 6)]) == [(0, 12)]
+    assert apply_censor("a s s and more", [(0, 5), (2, 3)]) == "***** and more"
@@ -0,0 +1,192 @@
+import sys
+import types
+import pytest
+
+# filter.py reads the lists and companies from database.py, which needs a Supabase client;
+# the tests serve them from this stand-in module instead
+database = types.ModuleType("database")
+database.banned_words = []
+database.allowed_words = []
+database.companies = {}
+database.flagged = []
+database.get_banned_words = lambda: [{"word": word} for word in database.banned_words]
+database.get_allowed_words = lambda: [{"word": word} for word in database.allowed_words]
+database.get_company_by_api_key = lambda api_key: database.companies.get(api_key, [])
+database.insert_flagged_message = lambda *row: database.flagged.append(row)
+sys.modules.setdefault("database", database)
+
+import filter
+import severity_table
+import word_break
+from cache import company_settings, list_versions
+from model2 import normalize_many
+from word_lists import CompiledWordList, TenantWordLists
+
+GLOBAL_BANNED = ["fuck", "shit", "asshole", "bitch", "ass"]
+CLEAN_WORDS = ["hello", "friend", "you", "are", "what", "this", "happens", "please", "classic", "glass", "pass",
+               "game", "good", "the"]
+# Severity the fake model gives each normalized token; anything else is 0
+SEVERITIES = {"fuck": 5, "shit": 4, "asshole": 5, "bitch": 4, "ass": 4, "noob": 3, "biatch": 4, "fuk": 4}
+
+MESSAGES = ["hello friend", "what the fuuuck", "sh1t happens", "what a noob", "f u c k this", "biatch please",
+            "classic glass pass", "you are an asshole", "good game"]
+
+
+def fake_severities(words: list) -> dict:
+    return {word: {"original": word, "normalized": normalized_word,
+                   "severity": SEVERITIES.get(normalized_word.lower(), 0)}
+            for word, normalized_word in zip(words, normalize_many(words))}
+
+
+def fake_message_score(tokens: list) -> dict:
+    # The message is as severe as its worst token, and every word token drives it equally
+    severities = fake_severities(tokens)
+    return {"severity": max((severities[token]["severity"] for token in tokens), default=0),
+            "attributions": [1.0 if any(char.isalnum() for char in token) else 0.0 for token in tokens]}
+
+
+@pytest.fixture
+def company(monkeypatch):
+    monkeypatch.setattr(database, "banned_words", list(GLOBAL_BANNED))
+    monkeypatch.setattr(database, "allowed_words", [])
+    monkeypatch.setattr(database, "flagged", [])
+    monkeypatch.setattr(database, "companies", {"key": {
+        "company_id": 1, "company_name": "Test", "profanity_tolerance": 3, "pipeline": None,
+        "custom_banned_words": ["noob"], "custom_allowed_words": [], "custom_patterns": []}})
+    for name in ("get_banned_words", "get_allowed_words", "get_company_by_api_key", "insert_flagged_message"):
+        monkeypatch.setattr(filter, name, getattr(database, name))
+    monkeypatch.setattr(filter, "get_severities", fake_severities)
+    monkeypatch.setattr(filter, "score_message", fake_message_score)
+    # Compiling a list brings its terms into the known severity table
+    monkeypatch.setattr(severity_table, "predict_normalized_many",
+                        lambda terms: [SEVERITIES.get(term, 0) for term in terms])
+    monkeypatch.setattr(word_break, "clean_dictionary",
+                        word_break.CompactTrie(CLEAN_WORDS + list(word_break.SHORT_WORDS)))
+    # Start every test from freshly loaded lists and company settings
+    list_versions.bump_global()
+    list_versions.bump_company(1)
+    company_settings.invalidate(lambda value: True)
+    return database.companies["key"]
+
+
+def check(texts: list, pipeline: str) -> list:
+    database.companies["key"]["pipeline"] = pipeline
+    company_settings.invalidate(lambda value: True)
+    return [(result["censored_text"], result["flagged_words"])
+            for result in filter.check_profanity_batch(texts, "key")["results"]]
+
+
+def test_check_profanity_censors_and_logs(company):
+    result = filter.check_profanity("what the fuuuck", "key")
+    assert result["censored_text"] == "what the ******"
+    assert result["flagged_words"] == ["fuck"]
+    assert result["spans"] == [{"start": 9, "end": 15, "word": "fuck"}]
+    assert database.flagged == [(1, "what the fuuuck", "what the ******", ["fuck"])]
+
+    result = filter.check_profanity("hello friend", "key")
+    assert result == {"censored_text": "hello friend", "flagged_words": [], "spans": []}
+    assert len(database.flagged) == 1
+
+
+def test_unknown_api_key_is_an_error(company):
+    assert filter.check_profanity("what the fuck", "unknown") == {"error": "Invalid API key"}
+    assert filter.check_profanity_batch(["what the fuck"], "unknown") == {"error": "Invalid API key"}
+
+
+def test_batch_matches_single_messages(company):
+    batch = filter.check_profanity_batch(MESSAGES, "key")["results"]
+    assert batch == [filter.check_profanity(text, "key") for text in MESSAGES]
+    assert [result["censored_text"] for result in batch] == [
+        "hello friend", "what the ******", "**** happens", "what a ****", "******* this", "****** please",
+        "classic glass pass", "you are an *******", "good game"]
+
+
+def test_pipelines_agree_when_severity_and_matches_agree(company):
+    # Every matched token here is at or above the company threshold, so the pipelines
+    # only differ in the order they check things and must censor the same words
+    lexical_first = check(MESSAGES, "lexical_first")
+    assert check(MESSAGES, "model_first") == lexical_first
+    assert check(MESSAGES, "message_level") == lexical_first
+
+
+def test_pipelines_agree_on_low_severity_fuzzy_matches(company, monkeypatch):
+    # "was" is within fuzzy reach of "ass" but scores 0: no pipeline censors it
+    monkeypatch.setattr(database, "banned_words", GLOBAL_BANNED + ["wasp"])
+    list_versions.bump_global()
+    texts = ["it was fine", "wasps"]
+    results = [check(texts, pipeline) for pipeline in ("lexical_first", "model_first", "message_level")]
+    assert results[0] == results[1] == results[2] == [("it was fine", []), ("wasps", [])]
+
+
+def test_threshold_applies_in_every_pipeline(company):
+    company["profanity_tolerance"] = 5
+    for pipeline in ("lexical_first", "model_first", "message_level"):
+        assert check(["sh1t happens", "what the fuuuck"], pipeline) == [
+            ("sh1t happens", []), ("what the ******", ["fuck"])], pipeline
+
+
+def spaced_words(text: str, banned_words: list) -> list:
+    word_lists = TenantWordLists(CompiledWordList(frozenset(banned_words)), CompiledWordList(frozenset()))
+    tokens = list(filter.TOKEN_PATTERN.finditer(text))
+    normalized_tokens = filter.normalize_tokens([token.group() for token in tokens])
+    return [(banned_word, spaced_text) for _, _, banned_word, spaced_text
+            in filter.match_spaced(tokens, word_lists, normalized_tokens)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("f u c k this", [("fuck", "fuck")]),
+    ("what a.s.s", [("ass", "ass")]),
+    ("s h 1 t", [("shit", "shit")]),
+    ("v a g i n a", [("vagina", "vagina")]),
+])
+def test_spaced_out_words_are_joined(text, expected):
+    assert spaced_words(text, ["fuck", "ass", "shit", "vagina"]) == expected
+
+
+@pytest.mark.parametrize("text", ["no gg", "an us", "ho es", "ti tt", "pen is"])
+def test_ordinary_short_words_are_not_joined(text):
+    assert spaced_words(text, ["nog", "anus", "hoes", "tit", "penis"]) == []
+
+
+@pytest.fixture
+def allowlists(company, monkeypatch):
+    # The tokens containing a banned word are severe, so only the allowlists keep them uncensored
+    monkeypatch.setitem(SEVERITIES, "scunthorpe", 5)
+    monkeypatch.setitem(SEVERITIES, "welcometoscunthorpe", 5)
+    monkeypatch.setitem(SEVERITIES, "cunt", 5)
+    monkeypatch.setitem(SEVERITIES, "cock", 5)
+    monkeypatch.setattr(word_break, "clean_dictionary",
+                        word_break.CompactTrie(CLEAN_WORDS + ["welcome", "tail"] + list(word_break.SHORT_WORDS)))
+    monkeypatch.setattr(database, "banned_words", GLOBAL_BANNED + ["cunt", "cock"])
+    monkeypatch.setattr(database, "allowed_words", ["bass", "cocktail"])
+    company["custom_allowed_words"] = ["shit", "biatch", "scunthorpe"]
+    return company
+
+
+# Text and the stage that would censor it without the allowlists. "bass" and "cocktail" are
+# on the global allowlist; the other allowed words are on the company's and override global banned words
+ALLOWLISTED = [
+    ("shit happens", "exact"),
+    ("biatch please", "fuzzy"),
+    ("scunthorpe", "fuzzy"),
+    ("welcometoscunthorpe", "fuzzy"),
+    ("welcometococktail", "word break"),
+    ("b a s s", "spaced"),
+]
+
+
+@pytest.mark.parametrize("pipeline", ["lexical_first", "model_first", "message_level"])
+def test_allowlisted_words_are_left_alone(allowlists, pipeline):
+    texts = [text for text, _ in ALLOWLISTED]
+    assert check(texts, pipeline) == [(text, []) for text in texts]
+
+
+def test_the_same_words_are_censored_without_allowlists(allowlists, monkeypatch):
+    monkeypatch.setattr(database, "allowed_words", [])
+    list_versions.bump_global()
+    allowlists["custom_allowed_words"] = []
+    list_versions.bump_company(1)
+    texts = [text for text, _ in ALLOWLISTED]
+    assert [flagged for _, flagged in check(texts, "lexical_first")] == [
+        ["shit"], ["bitch"], ["cunt"], ["cunt"], ["cock"], ["ass"]]
+
@@ -0,0 +1,124 @@
+import random
+import pytest
+from rapidfuzz import fuzz
+from rapidfuzz.distance import Indel, Levenshtein
+import fuzzy_index
+from fuzzy_index import BKTree, FuzzyIndex, LevenshteinTrie, TrieFuzzyIndex, score
+
+BANNED = ["fuck", "shit", "bitch", "asshole", "ass", "cunt", "dick", "bastard", "motherfucker", "wanker",
+          "twat", "slut", "whore", "nigga", "retard", "kys", "cock", "pussy", "douchebag", "bollocks"]
+
+
+def random_tokens(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    tokens = []
+    for _ in range(count):
+        chars = list(rng.choice(BANNED + ["hello", "classic", "night", "gg", "pass", "a", "asshat"]))
+        for _ in range(rng.randrange(3)):
+            position = rng.randrange(len(chars) + 1)
+            operation = rng.choice(["insert", "delete", "substitute"])
+            if operation == "insert":
+                chars.insert(position, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+            elif chars and position < len(chars):
+                if operation == "delete":
+                    del chars[position]
+                else:
+                    chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        if rng.random() < 0.2:
+            chars = list("xx") + chars + list("yy")
+        tokens.append("".join(chars) or "q")
+    return tokens
+
+
+def linear_best_match(token: str, ratio_threshold: int = 85, partial_threshold: int = 90):
+    # Every banned word scored with the same rapidfuzz scorers, full-string matches first
+    ratios = [(score(fuzz.ratio, token, word), word) for word in sorted(BANNED)]
+    best = max(ratios, key=lambda pair: pair[0])
+    if best[0] >= ratio_threshold:
+        return best[0]
+    partials = [score(fuzz.partial_ratio, token, word) for word in BANNED]
+    return max(partials) if max(partials) >= partial_threshold else None
+
+
+@pytest.fixture(scope="module")
+def tokens():
+    return random_tokens(600)
+
+
+def test_best_match_agrees_with_linear_scan(tokens):
+    index = FuzzyIndex(BANNED)
+    for token in tokens:
+        match = index.best_match(token)
+        assert (match[1] if match else None) == linear_best_match(token), token
+
+
+def test_batched_and_single_scoring_agree(tokens):
+    for index in (FuzzyIndex(BANNED), TrieFuzzyIndex(BANNED, max_edits=2)):
+        batched = index.best_matches(tokens)
+        single = [index.best_match(token) for token in tokens]
+        assert [match and match[1] for match in batched] == [match and match[1] for match in single]
+
+
+def test_bk_tree_agrees_with_linear_scan(tokens):
+    tree = BKTree(BANNED)
+    for token in tokens:
+        for radius in (1, 3):
+            expected = {(Indel.distance(token, word), word) for word in BANNED if Indel.distance(token, word) <= radius}
+            assert set(tree.search(token, radius)) == expected, token
+
+
+def test_levenshtein_trie_agrees_with_linear_scan(tokens):
+    trie = LevenshteinTrie(BANNED)
+    for token in tokens:
+        for max_edits in (1, 2):
+            expected = {(Levenshtein.distance(token, word), word) for word in BANNED
+                        if Levenshtein.distance(token, word) <= max_edits}
+            assert set(trie.search(token, max_edits)) == expected, token
+
+
+def count_scored_pairs(monkeypatch) -> dict:
+    # Wraps the rapidfuzz calls of fuzzy_index and counts the token / banned word pairs they score
+    counted = {"pairs": 0}
+    cdist, extract_one = fuzzy_index.process.cdist, fuzzy_index.process.extractOne
+
+    def counting_cdist(tokens, banned_words, **kwargs):
+        counted["pairs"] += len(tokens) * len(banned_words)
+        return cdist(tokens, banned_words, **kwargs)
+
+    def counting_extract_one(token, banned_words, **kwargs):
+        counted["pairs"] += len(banned_words)
+        return extract_one(token, banned_words, **kwargs)
+
+    monkeypatch.setattr(fuzzy_index.process, "cdist", counting_cdist)
+    monkeypatch.setattr(fuzzy_index.process, "extractOne", counting_extract_one)
+    return counted
+
+
+def test_batch_scores_no_more_pairs_than_per_message(monkeypatch, tokens):
+    index = FuzzyIndex(BANNED)
+    messages = [tokens[start:start + 6] for start in range(0, len(tokens), 6)]
+    counted = count_scored_pairs(monkeypatch)
+    per_message = [match for message in messages for match in index.best_matches(message)]
+    per_message_pairs = counted["pairs"]
+
+    counted["pairs"] = 0
+    batched = index.best_matches(tokens)
+    assert counted["pairs"] <= per_message_pairs
+    assert batched == per_message
+
+    # Partial scoring only pairs each token with its own trigram candidates
+    counted["pairs"] = 0
+    index._score_batch(list(dict.fromkeys(tokens)), fuzz.partial_ratio, 90, index.trigram_index.candidates)
+    assert counted["pairs"] <= sum(len(index.trigram_index.candidates(token)) for token in dict.fromkeys(tokens))
+
+
+def test_batch_ratio_pass_only_scores_ratio_index_candidates(monkeypatch, tokens):
+    index = FuzzyIndex(BANNED)
+    searched = []
+    search = index.tree.search
+    monkeypatch.setattr(index.tree, "search", lambda word, radius: searched.append(word) or search(word, radius))
+    counted = count_scored_pairs(monkeypatch)
+    unique_tokens = list(dict.fromkeys(tokens))
+    index._score_batch(unique_tokens, fuzz.ratio, 85, index.ratio_candidates)
+    assert searched
+    assert counted["pairs"] == sum(len(index.ratio_candidates(token)) for token in unique_tokens)
@@ -0,0 +1,107 @@
+import random
+import pytest
+from matcher import BannedWordMatcher
+from leet_lattice import LeetTrie, needs_lattice, token_lattice, LEET_READINGS, WILDCARDS
+
+BANNED = ["ass", "dix", "shit", "xx", "whore", "fuck", "boob", "hor"]
+
+
+@pytest.fixture
+def leet_trie():
+    return LeetTrie(BannedWordMatcher(sorted(BANNED)), frozenset(BANNED))
+
+
+@pytest.mark.parametrize("token", ["455", "8008", "#1", "***", "??", "!!!"])
+def test_tokens_without_letters_are_not_read(token):
+    assert not needs_lattice(token)
+
+
+@pytest.mark.parametrize("token", ["a**", "h**", "*ss", "?x", "**it"])
+def test_wildcards_are_a_minority_and_never_first(leet_trie, token):
+    assert leet_trie.match(token) is None
+
+
+@pytest.mark.parametrize("token, word", [("f*ck", "fuck"), ("f**k", "fuck"), ("sh1t", "shit"), ("$h!t", "shit"),
+                                         ("b00b", "boob"), ("wh0r3", "whore"), ("a$$", "ass")])
+def test_leetspeak_readings_still_match(leet_trie, token, word):
+    assert needs_lattice(token)
+    assert leet_trie.match(token) == word
+
+
+def readings(token: str):
+    # Every path through the lattice, as a list of letters with None for a wildcard
+    lattice = token_lattice(token)
+
+    def walk(position):
+        if position == len(token):
+            yield []
+            return
+        for end, letters in lattice[position]:
+            for rest in walk(end):
+                yield ([None] if letters is None else list(letters)) + rest
+
+    return walk(0)
+
+
+def wildcards_needed(reading: list, word: str):
+    # Fewest wildcards for reading to spell word, a repeat of the last letter read being absorbed
+    best = None
+
+    def walk(index, read, last, wildcards):
+        nonlocal best
+        if index == len(reading):
+            if read == len(word) and (best is None or wildcards < best):
+                best = wildcards
+            return
+        symbol = reading[index]
+        if symbol is None:
+            if 0 < read < len(word):
+                walk(index + 1, read + 1, word[read], wildcards + 1)
+            return
+        if read < len(word) and word[read] == symbol:
+            walk(index + 1, read + 1, symbol, wildcards)
+        if read and symbol == last:
+            walk(index + 1, read, last, wildcards)
+
+    walk(0, 0, "", 0)
+    return best
+
+
+def linear_scan(token: str):
+    # Every reading of the token tried against every banned word, ranked as LeetTrie.match ranks them
+    matches = []
+    for reading in readings(token.lower()):
+        for word in BANNED:
+            wildcards = wildcards_needed(reading, word)
+            if wildcards is not None and 2 * wildcards <= len(word):
+                matches.append((wildcards, -len(word), word))
+    return min(matches)[2] if matches else None
+
+
+def random_tokens(count: int, seed: int = 11) -> list:
+    rng = random.Random(seed)
+    spellings = {}
+    for char, letters in LEET_READINGS.items():
+        for letter in letters:
+            spellings.setdefault(letter, []).append(char)
+    tokens = []
+    for _ in range(count):
+        chars = []
+        for char in rng.choice(BANNED + ["hello", "class", "bass", "shoe"]):
+            roll = rng.random()
+            if roll < 0.3 and char in spellings:
+                char = rng.choice(spellings[char])
+            elif roll < 0.4:
+                char = rng.choice(WILDCARDS)
+            elif roll < 0.5:
+                char = char * 2
+            elif roll < 0.55:
+                char = char + "_"
+            chars.append(char)
+        tokens.append("".join(chars))
+    return tokens
+
+
+def test_lattice_agrees_with_linear_scan(leet_trie):
+    for token in random_tokens(300):
+        assert leet_trie.match(token) == linear_scan(token), token
@@ -0,0 +1,58 @@
+import random
+import re
+import pytest
+from matcher import BannedWordMatcher
+
+BANNED = ["ass", "asshole", "hole", "fuck", "shit", "pussy", "cock", "sus", "kys", "xx", "boob", "bob", "anal"]
+
+
+def run_start(text: str, position: int) -> int:
+    while position and text[position - 1] == text[position]:
+        position -= 1
+    return position
+
+
+def linear_scan(text: str) -> set:
+    # The per-word scan the automaton replaces: every letter may repeat, and a doubled letter needs two
+    found = set()
+    for word in BANNED:
+        pattern = re.compile("".join(re.escape(char) + ("" if index and char == word[index - 1] else "+")
+                                     for index, char in enumerate(word)))
+        for start in range(len(text)):
+            match = pattern.match(text, start)
+            if match:
+                found.add((run_start(text, start), word))
+    return found
+
+
+def found_by_automaton(text: str) -> set:
+    return {(start, word) for start, _, word in BannedWordMatcher(BANNED).find_all(text)}
+
+
+def random_texts(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        pieces = ["".join(char * rng.choice([1, 1, 1, 2, 3]) for char in rng.choice(BANNED))
+                  for _ in range(rng.randrange(1, 5))]
+        texts.append(rng.choice(["", "n", "s", "a", " the "]).join(pieces))
+    return texts
+
+
+@pytest.mark.parametrize("text", ["nasshole", "pussssy", "fuuuuck", "asshole", "boobob", "sssus", "xxx",
+                                  "classic", "as", "shole", "hello world"])
+def test_automaton_agrees_with_linear_scan(text):
+    assert found_by_automaton(text) == linear_scan(text)
+
+
+def test_automaton_agrees_with_linear_scan_on_random_texts():
+    for text in random_texts(300):
+        assert found_by_automaton(text) == linear_scan(text), text
+
+
+def test_spans_cover_stretched_letters():
+    matcher = BannedWordMatcher(BANNED)
+    assert (0, 7, "fuck") in matcher.find_all("fuuuuck")
+    assert (1, 8, "asshole") in matcher.find_all("nasshole")
+    # One s cannot be read as the two of "ass"
+    assert "ass" not in [word for _, _, word in matcher.find_all("as")]
@@ -0,0 +1,29 @@
+import message_model
+from message_model import message_text, score_message
+
+
+class FixedModel:
+    """
+    Stands in for the message model: every n-gram of two or four characters
+    contributes 1.
+    """
+
+    def explain(self, text):
+        return 5, [(start, start + n, 1.0) for n in (2, 4) for start in range(len(text) - n + 1)]
+
+
+def test_ngrams_across_a_separator_belong_to_no_token(monkeypatch):
+    monkeypatch.setattr(message_model, "message_model", FixedModel())
+    tokens = ["gg", "wp", "fuck"]
+    text, offsets = message_text(tokens)
+    assert text == "gg wp fuck"
+
+    attributions = score_message(tokens)["attributions"]
+    # Only the n-grams inside each word: "gg" has one bigram, "wp" one, "fuck" three bigrams and the 4-gram
+    assert attributions == [1.0, 1.0, 4.0]
+
+
+def test_tokens_that_normalize_to_nothing_get_no_attribution(monkeypatch):
+    monkeypatch.setattr(message_model, "message_model", FixedModel())
+    attributions = score_message(["!", "gg", "?", "wp"])["attributions"]
+    assert attributions == [0.0, 1.0, 0.0, 1.0]
@@ -0,0 +1,60 @@
+import threading
+import numpy as np
+import pytest
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+import model_artifacts
+import model2
+import message_model
+from ngram_model import NgramLinearModel
+
+WORDS = ["fuck", "shit", "hello", "friend", "bitch", "nice", "damn", "peace"]
+LABELS = [5, 4, 0, 0, 4, 0, 2, 0]
+
+
+@pytest.fixture
+def artifacts_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_artifacts, "ARTIFACTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def fitted_model():
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), analyzer="char")
+    model = LogisticRegression(max_iter=1000).fit(vectorizer.fit_transform(WORDS), LABELS)
+    return vectorizer, model
+
+
+def test_concurrent_exports_get_their_own_complete_versions(artifacts_dir):
+    vectorizer, model = fitted_model()
+    versions = []
+    threads = [threading.Thread(target=lambda: versions.append(model_artifacts.save_artifacts("severity", vectorizer, model)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(versions)) == 4
+    assert sorted(path.name for path in (artifacts_dir / "severity").iterdir() if path.is_dir()) == sorted(versions)
+    assert model_artifacts.latest_version("severity") in versions
+    for version in versions:
+        artifacts = model_artifacts.load_artifacts("severity", version)
+        assert artifacts["manifest"]["version"] == version
+
+
+def test_runtime_matches_sklearn_on_exported_artifacts(artifacts_dir):
+    vectorizer, model = fitted_model()
+    model_artifacts.save_artifacts("severity", vectorizer, model)
+    texts = WORDS + ["fuuck", "helo", "", "x" * 30]
+    runtime = NgramLinearModel(model_artifacts.load_artifacts("severity"))
+    assert np.array_equal(runtime.predict(texts), model.predict(vectorizer.transform(texts)))
+
+
+def test_models_fail_fast_without_artifacts(artifacts_dir, monkeypatch):
+    monkeypatch.setattr(model2, "severity_model", None)
+    monkeypatch.setattr(message_model, "message_model", None)
+    with pytest.raises(RuntimeError, match="train.py"):
+        model2.get_severity_model()
+    with pytest.raises(RuntimeError, match="train.py"):
+        message_model.get_message_model()
+    assert not any(artifacts_dir.iterdir())
@@ -0,0 +1,20 @@
+import random
+import pytest
+from model2 import normalize_many, normalize_word, normalize_word_reference
+from severity_table import dataset_terms
+
+# Leetspeak symbols, separators, whitespace and letters the replacements act on, as train.py samples them
+SYMBOLS = "|/\\vV@1!3079()5_- \t\nabcfkushinw"
+
+
+def test_matches_the_reference_on_the_dataset():
+    words = dataset_terms()
+    assert normalize_many(words) == [normalize_word_reference(word) for word in words]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_the_reference_on_random_symbol_strings(seed):
+    rng = random.Random(seed)
+    for _ in range(4000):
+        word = "".join(rng.choice(SYMBOLS) for _ in range(rng.randint(0, 14)))
+        assert normalize_word(word) == normalize_word_reference(word), repr(word)
@@ -0,0 +1,92 @@
+import threading
+import time
+import pytest
+import regex
+import pattern_rules
+from pattern_rules import pattern_problem, PatternRules
+
+ACCEPTED = [
+    r"\bk+y+s+\b",
+    r"bit\.ly/\w+",
+    r"discord\.gg/\w+",
+    r"\+?\d[\d -]{7,}\d",
+    r"(?:https?://)?(?:www\.)?\w+\.\w+",
+    r"(ab){2,5}",
+    r"[^a-z]+[a-z]+",
+    r"\b(?:kys|kill yourself)\b",
+    r"(?:\d{3}-){2}\d{4}",
+    r"(?:\d{3}-)+\d{4}",
+    r"(?:kys|kill yourself)+",
+]
+
+REJECTED = [
+    r"(a+)+$",
+    r"(x+y?)*",
+    r"(a|ab)*c",
+    r"(?:a|)+b",
+    r"(?:\w+\s?){1,20}!",
+    r"(a{1,30}){1,30}b",
+    r".*.*.*.*.*x",
+    r".*a.*x",
+    r"\d+\s*\d+",
+    r"\w+\s?\w+",
+    r"(a+)(a+)b",
+    r"(\w)\1",
+    r"(?P<x>a)",
+    r"[",
+    "",
+    "a" * 500,
+]
+
+
+@pytest.mark.parametrize("pattern", ACCEPTED)
+def test_accepts_safe_patterns(pattern):
+    assert pattern_problem(pattern) is None
+
+
+@pytest.mark.parametrize("pattern", REJECTED)
+def test_rejects_unsafe_or_invalid_patterns(pattern):
+    assert pattern_problem(pattern) is not None
+
+
+def test_accepted_patterns_stay_fast_on_adversarial_text():
+    rules = PatternRules(ACCEPTED)
+    for text in ("a" * 2000, "1 " * 1000, "a." * 1000, "aaaa " * 400 + "!"):
+        started = time.perf_counter()
+        rules.find_all(text)
+        assert time.perf_counter() - started < 0.5
+    assert rules.timeouts == 0
+
+
+def test_timeouts_are_counted_from_every_thread(monkeypatch):
+    rules = PatternRules(["kys"])
+    rules.regex = regex.compile(r"(?P<rule0>(a{1,30}){1,30}b)")
+    monkeypatch.setattr(pattern_rules, "PATTERN_TIMEOUT", 0.001)
+    threads = [threading.Thread(target=rules.find_all, args=("a" * 50,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert rules.timeouts == 8
+
+
+def test_rejected_rules_are_left_out():
+    rules = PatternRules([r"kys", r"(a+)+$"])
+    assert rules.patterns == ["kys"]
+    assert set(rules.rejected) == {r"(a+)+$"}
+
+
+def test_matches_report_the_rule_that_fired():
+    rules = PatternRules([r"\bk+y+s+\b", r"bit\.ly/\w+"])
+    text = "KYYS and bit.ly/abc"
+    assert rules.find_all(text) == [(0, 4, r"\bk+y+s+\b"), (9, 19, r"bit\.ly/\w+")]
+
+
+def test_scan_is_cut_short_by_the_timeout():
+    rules = PatternRules(["kys"])
+    # Bypass the guard to check the timeout backstop on its own
+    rules.regex = regex.compile(r"(?P<rule0>(a{1,30}){1,30}b)")
+    started = time.perf_counter()
+    assert rules.find_all("a" * 50) == []
+    assert time.perf_counter() - started < 2
+    assert rules.timeouts == 1
@@ -0,0 +1,26 @@
+import random
+from phrase_index import PhraseIndex
+
+PHRASES = [("kill", "yourself"), ("kill", "your", "self"), ("go", "die"), ("alabama", "hot", "pocket"),
+           ("hot", "pocket"), ("your", "mom")]
+
+
+def linear_scan(tokens: list) -> set:
+    # Every phrase compared at every token position
+    return {(start, start + len(phrase), " ".join(phrase)) for phrase in PHRASES
+            for start in range(len(tokens) - len(phrase) + 1) if tuple(tokens[start:start + len(phrase)]) == phrase}
+
+
+def test_phrase_index_agrees_with_linear_scan():
+    index = PhraseIndex({phrase: " ".join(phrase) for phrase in PHRASES})
+    vocabulary = sorted({token for phrase in PHRASES for token in phrase}) + ["gg", "hot", "go"]
+    rng = random.Random(5)
+    for _ in range(500):
+        tokens = [rng.choice(vocabulary) for _ in range(rng.randrange(12))]
+        assert set(index.find_all(tokens)) == linear_scan(tokens), tokens
+
+
+def test_overlapping_phrases_are_all_reported():
+    index = PhraseIndex({phrase: " ".join(phrase) for phrase in PHRASES})
+    assert sorted(index.find_all(["an", "alabama", "hot", "pocket"])) == [
+        (1, 4, "alabama hot pocket"), (2, 4, "hot pocket")]
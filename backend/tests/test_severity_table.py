@@ -0,0 +1,32 @@
+import severity_table
+from cache import LRUCache
+from severity_table import SeverityTable
+
+
+def test_evicted_sources_leave_the_table(monkeypatch):
+    monkeypatch.setattr(severity_table, "predict_normalized_many", lambda terms: [3] * len(terms))
+    table = SeverityTable()
+    compiled = LRUCache(100, on_evict=lambda key, words: table.remove_source(key[0]))
+
+    table.update_source("dataset", frozenset(["hello"]))
+    for company_id in range(50):
+        words = frozenset([f"word{company_id}", "shared"])
+        compiled.put((company_id, 1), words, 30)
+        table.update_source(company_id, words)
+
+    # Only the companies still cached keep their terms; the dataset's terms are never evicted
+    cached = [key[0] for key in compiled.keys()]
+    assert len(cached) == 3
+    assert set(table.sources) == {"dataset", *cached}
+    expected = ["hello", "shared"] + [f"word{company_id}" for company_id in cached]
+    assert set(table.severities) == set(severity_table.normalize_many(expected))
+
+
+def test_pop_reports_the_entry():
+    evicted = []
+    cache = LRUCache(100, on_evict=lambda key, value: evicted.append((key, value)))
+    cache.put("a", 1, 10)
+    cache.pop("a")
+    cache.pop("missing")
+    assert evicted == [("a", 1)]
+    assert len(cache) == 0
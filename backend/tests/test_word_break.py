@@ -0,0 +1,74 @@
+import itertools
+import pytest
+import word_break
+from word_break import CompactTrie, CLEAN
+from word_lists import CompiledWordList
+
+BANNED = ["ass", "asshole", "cock", "shit", "fuck", "fuckyou"]
+DICTIONARY = ["glass", "bass", "class", "classic", "assassin", "cocktail", "you", "are", "an", "as", "hole",
+              "shole", "this", "is", "game", "fucks", "shitty", "tail", "cocks", "your", "yourself", "self"]
+
+
+@pytest.fixture
+def word_list(monkeypatch):
+    monkeypatch.setattr(word_break, "clean_dictionary", CompactTrie(DICTIONARY + list(word_break.SHORT_WORDS)))
+    return CompiledWordList(frozenset(BANNED))
+
+
+def brute_force_splits(token: str, words: set):
+    for cuts in itertools.product([False, True], repeat=len(token) - 1):
+        pieces, start = [], 0
+        for position, cut in enumerate(cuts, 1):
+            if cut:
+                pieces.append(token[start:position])
+                start = position
+        pieces.append(token[start:])
+        if all(piece in words for piece in pieces):
+            yield pieces
+
+
+@pytest.mark.parametrize("token", ["glass", "bass", "classicassassin", "cocktail", "thisisgame"])
+def test_clean_splits_are_final(word_list, token):
+    assert word_list.find_concatenated_match(token) is CLEAN
+    # A clean token never reaches the fuzzy index, which would match "bass" to "ass"
+    assert word_list.match_tokens([token]) == [None]
+
+
+def test_glued_banned_word_is_found(word_list):
+    assert word_list.find_concatenated_match("youareanasshole") == "asshole"
+    assert word_list.match_tokens(["youareanasshole"]) == [("asshole", 100, False, True)]
+    assert word_list.match_glued(["youareanasshole", "classicassassin", "glass"]) == [
+        ("asshole", 100, False, True), None, None]
+
+
+def test_rare_words_and_inflections_do_not_hide_banned_words(word_list):
+    # "you|are|an|as|shole" would cut through "asshole"; "fucks" is a form of "fuck"
+    assert word_list.find_concatenated_match("youareanasshole") is not CLEAN
+    assert word_list.find_concatenated_match("thisisfucks") is not CLEAN
+    assert word_list.find_concatenated_match("thisisshitty") == "shit"
+
+
+def test_overlapping_banned_words_do_not_block_each_other(word_list):
+    # "fuckyou" covers the split after "fuck", but "fuck" itself ends there
+    assert word_list.find_concatenated_match("gofuckyourself") == "fuck"
+    assert word_list.find_concatenated_match("thisisfuckyou") == "fuckyou"
+
+
+@pytest.mark.parametrize("token", ["classicassassin", "youareanasshole", "thisisshitgame", "glasscocktail", "asshat",
+                                   "gofuckyourself", "fuckyouself", "thisisfuckyou"])
+def test_split_agrees_with_brute_force(word_list, token):
+    # A clean verdict needs a split into clean words, and a banned verdict a split at all
+    clean_words = set(DICTIONARY + list(word_break.SHORT_WORDS)) - set(BANNED)
+    clean_words = {word for word in clean_words
+                   if not any(word.startswith(banned) and word[len(banned):].lstrip(banned[-1]) in word_break.INFLECTIONS
+                              for banned in BANNED)}
+    all_words = clean_words | set(BANNED)
+    has_clean_split = any(brute_force_splits(token, clean_words))
+    has_split = any(brute_force_splits(token, all_words))
+    result = word_list.find_concatenated_match(token)
+    if result is CLEAN:
+        assert has_clean_split
+    elif result is None:
+        assert not has_split or len(token) < 6
+    else:
+        assert has_split and result in BANNED
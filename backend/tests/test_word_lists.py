@@ -0,0 +1,29 @@
+from model2 import normalize_many
+from word_lists import CompiledWordList, TenantWordLists
+
+
+def normalized(tokens: list) -> list:
+    # Message tokens reach the word lists normalized and lowercased
+    return [token.lower() for token in normalize_many(tokens)]
+
+
+def test_list_entries_are_normalized_like_tokens():
+    word_list = CompiledWordList(frozenset(["ass-hat", "a_s_s", "B00bs", "assshole"]), frozenset(["gl@ss"]))
+    assert word_list.words == {"asshat", "ass", "boobs", "ashole"}
+    assert word_list.allowed_words == {"glass"}
+    verdicts = word_list.match_tokens(normalized(["ass-hat", "a_s_s", "b00bs", "assshole", "asshat"]))
+    assert [verdict[0] for verdict in verdicts] == ["asshat", "ass", "boobs", "ashole", "asshat"]
+    assert all(verdict[2] for verdict in verdicts)
+
+
+def test_company_allowlist_clears_global_matches_inside_allowed_words():
+    global_list = CompiledWordList(frozenset(["ass", "cunt"]))
+    company_list = CompiledWordList(frozenset(["noob"]), frozenset(["bass", "scunthorpe"]))
+    word_lists = TenantWordLists(global_list, company_list)
+    assert global_list.find_spanning_matches(["b", "a", "s", "s"]) == [(1, 4, "ass")]
+    assert word_lists.find_spanning_matches(["b", "a", "s", "s"]) == []
+    assert word_lists.find_spanning_matches(["a", "s", "s", "b", "a", "s", "s"]) == [(0, 3, "ass")]
+    assert global_list.match_tokens(["welcometoscunthorpe"])[0] is not None
+    verdicts = word_lists.match_tokens(["welcometoscunthorpe", "scunthorpe", "cunts"])
+    assert verdicts[:2] == [None, None]
+    assert verdicts[2][0] == "cunt"
@@ -0,0 +1,192 @@
+import random
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
+from model_artifacts import save_artifacts, load_artifacts, build_model, WEIGHT_DTYPES
+from ngram_model import NgramLinearModel
+
+# Trains the models and exports them as artifacts for the API to load.
+# Run at build/deploy time: python train.py
+
+
+def train_severity_model():
+    """
+    Trains the per-word severity model on model2.py's dataset and exports it as "severity".
+    """
+    from model2 import data, normalize_word, REPLACEMENTS, CORRECTIONS
+
+    # Normalize dataset
+    df = pd.DataFrame(data, columns=["word", "severity"])
+    df["normalized"] = df["word"].apply(normalize_word)
+
+    # Feature extraction using TF-IDF vectorizer
+    vectorizer = TfidfVectorizer(ngram_range=(1,2), analyzer='char')
+    X = vectorizer.fit_transform(df["normalized"])
+    y = df["severity"]
+
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Train a logistic regression model
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X_train, y_train)
+
+    # Evaluation
+    y_pred = model.predict(X_test)
+    print(classification_report(y_test, y_pred))
+
+    version = save_artifacts("severity", vectorizer, model,
+                             {"replacements": REPLACEMENTS, "corrections": CORRECTIONS})
+    print(f"Exported severity model version {version}")
+    return version
+
+
+def train_profanity_model():
+    """
+    Trains the profanity classifier on model.py's dataset and exports it as "profanity".
+    """
+    from model import data
+
+    # 2. Convert the dataset into a pandas DataFrame
+    df = pd.DataFrame(data)
+
+    # 3. Preprocess the data using TF-IDF Vectorizer
+    vectorizer = TfidfVectorizer()
+    X = vectorizer.fit_transform(df['word'])
+    y = df['profanity_level']
+
+    # 4. Split the data into training and testing sets (80% training, 20% testing)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # 5. Train a Logistic Regression model on the training set
+    model = LogisticRegression()
+    model.fit(X_train, y_train)
+
+    # 6. Evaluate on the testing set: accuracy, classification report and confusion matrix
+    y_pred = model.predict(X_test)
+    print(f'Accuracy: {accuracy_score(y_test, y_pred):.2f}')
+    print("\nClassification Report:")
+    print(classification_report(y_test, y_pred))
+    print("\nConfusion Matrix:")
+    print(confusion_matrix(y_test, y_pred))
+
+    version = save_artifacts("profanity", vectorizer, model)
+    print(f"Exported profanity model version {version}")
+    return version
+
+
+def message_dataset(size: int = 20000, seed: int = 42):
+    """
+    Synthetic chat messages built from the word datasets: one to eight clean
+    words, half of them with one profane word inserted. A message's severity
+    is the highest severity of its words, using model2.py's labels and the
+    exported severity model for model.py's words.
+    """
+    from model import data as profanity_data
+    from model2 import data as severity_data, normalize_word, predict_severity_many
+
+    severities = {normalize_word(word).lower(): severity for word, severity in severity_data}
+    unlabelled = [word for word in profanity_data["word"] if normalize_word(word).lower() not in severities]
+    for model_output in predict_severity_many(unlabelled):
+        severities.setdefault(model_output["normalized"].lower(), int(model_output["severity"]))
+    clean_words = sorted(word for word, severity in severities.items() if severity == 0)
+    profane_words = sorted(word for word, severity in severities.items() if severity > 0)
+
+    rng = random.Random(seed)
+    messages, labels = [], []
+    for _ in range(size):
+        words = [rng.choice(clean_words) for _ in range(rng.randint(1, 8))]
+        if rng.random() < 0.5:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(profane_words))
+        messages.append(" ".join(words))
+        labels.append(max(severities[word] for word in words))
+    return messages, labels
+
+
+def train_message_model():
+    """
+    Trains the message-level severity model on synthetic messages and exports it as "message_severity".
+    """
+    messages, labels = message_dataset()
+
+    # Char n-grams over the whole normalized message; longer n-grams than the word model, since
+    # the profane word is a small part of the text
+    vectorizer = TfidfVectorizer(ngram_range=(2,4), analyzer='char', sublinear_tf=True)
+    X = vectorizer.fit_transform(messages)
+    X_train, X_test, y_train, y_test = train_test_split(X, labels, test_size=0.2, random_state=42)
+
+    model = LogisticRegression(max_iter=1000)
+    model.fit(X_train, y_train)
+
+    y_pred = model.predict(X_test)
+    print(f'Message accuracy: {accuracy_score(y_test, y_pred):.2f}')
+    print(classification_report(y_test, y_pred, zero_division=0))
+
+    version = save_artifacts("message_severity", vectorizer, model)
+    print(f"Exported message model version {version}")
+    return version
+
+
+def check_normalizer(words: list, fuzz_size: int = 100000, seed: int = 42):
+    """
+    Checks that the compiled normalize_word gives byte-identical output to
+    the original regex loop on the given words plus random strings of
+    leetspeak symbols, separators and whitespace.
+    """
+    from model2 import normalize_many, normalize_word_reference
+
+    rng = random.Random(seed)
+    symbols = "|/\\vV@1!3079()5_- \t\nabcfkushinw"
+    corpus = list(words) + ["".join(rng.choice(symbols) for _ in range(rng.randint(0, 14))) for _ in range(fuzz_size)]
+    mismatches = [word for word, normalized in zip(corpus, normalize_many(corpus))
+                  if normalized != normalize_word_reference(word)]
+    print(f"normalize_word matches the reference on {len(corpus) - len(mismatches)} of {len(corpus)} words")
+    if mismatches:
+        raise AssertionError(f"normalize_word differs from the reference on {mismatches[:10]}")
+
+
+def check_conformance(name: str, texts: list, hash_buckets: int = None, weights: str = "float64") -> float:
+    """
+    Compares the NumPy runtime's predictions with sklearn's on the exported
+    artifacts. Exact lookups with float64 weights must agree on every text;
+    hashed lookups and quantized weights are approximate, so only their
+    agreement rate (the accuracy lost against the exact model) is reported.
+    Returns the fraction of texts with the same prediction.
+    """
+    vectorizer, model = build_model(load_artifacts(name, vocabulary=True))
+    expected = model.predict(vectorizer.transform(texts))
+    runtime = NgramLinearModel(load_artifacts(name, weights=weights, vocabulary=bool(hash_buckets)), hash_buckets)
+    actual = runtime.predict(texts)
+    agreement = float((expected == actual).mean())
+    mode = f"{hash_buckets} hash buckets" if hash_buckets else "exact vocabulary"
+    print(f"{name} runtime ({mode}, {weights} weights) agrees with sklearn on {agreement:.2%} of {len(texts)} texts")
+    if not hash_buckets and weights == "float64" and agreement < 1:
+        raise AssertionError(f"{name} runtime does not match sklearn")
+    return agreement
+
+
+if __name__ == "__main__":
+    train_severity_model()
+    train_profanity_model()
+    train_message_model()
+
+    # Conformance of the serving runtime: training words, their normalized forms and unseen text
+    from model import data as profanity_data
+    from model2 import data as severity_data, normalize_word
+    texts = profanity_data["word"] + [word for word, _ in severity_data]
+    check_normalizer(texts)
+    texts += [normalize_word(text) for text in texts] + ["", " ", "hello  there friend", "ÜBER", "x" * 50]
+    for name in ("severity", "profanity"):
+        for weights in WEIGHT_DTYPES:
+            check_conformance(name, texts, weights=weights)
+    for hash_buckets in (1 << 12, 1 << 16):
+        check_conformance("severity", texts, hash_buckets)
+    messages, _ = message_dataset(2000, seed=7)
+    for weights in WEIGHT_DTYPES:
+        check_conformance("message_severity", messages, weights=weights)
+
+    # Example usage, served from the exported artifacts
+    from model2 import predict_severity
+    print(predict_severity("|\|igga"))
@@ -0,0 +1,186 @@
+import itertools
+import os
+from array import array
+
+# Word list used to tell ordinary words from banned words glued into one token
+# ("youareanasshole"); one word per line, as in /usr/share/dict/words. When the file is
+# missing (slim images), the web2 list of the english-words package is used instead
+CLEAN_DICTIONARY_PATH = os.getenv("CLEAN_DICTIONARY_PATH", "/usr/share/dict/words")
+
+# Dictionaries list every letter and many two-letter abbreviations as words, which would
+# let any token be split around a banned word ("c|ass|and|r|a"). Only these short words count.
+SHORT_WORDS = frozenset([
+    "a", "i", "u", "am", "an", "as", "at", "be", "by", "do", "go", "he", "hi", "if", "in", "is", "it",
+    "me", "my", "no", "of", "oh", "ok", "on", "or", "so", "to", "ty", "up", "ur", "us", "we", "ya", "yo",
+])
+MIN_WORD_LENGTH = 3
+
+# Endings that keep a dictionary word a form of the banned word it starts with ("fucks", "shitty")
+INFLECTIONS = frozenset(["s", "es", "ed", "er", "ers", "in", "ing", "y", "ies"])
+
+# Returned by find_concatenated for a token made of clean words only
+CLEAN = object()
+
+clean_dictionary = None
+
+
+class CompactTrie:
+    """
+    Trie packed into flat arrays, for dictionaries of a few hundred thousand
+    words: nodes are numbered breadth-first, so the edges leaving node n are
+    labels[first[n]:first[n + 1]] leading to targets[first[n]:first[n + 1]].
+    About ten bytes per node instead of a dict per node.
+    """
+
+    def __init__(self, words):
+        words = sorted(set(word for word in words if word))
+        labels = []
+        self.targets = array("I")
+        self.first = array("I")
+        self.terminal = bytearray()
+        # Each node covers the range of sorted words sharing its prefix
+        queue = [(0, len(words), 0)]
+        for lo, hi, depth in queue:
+            self.first.append(len(labels))
+            self.terminal.append(lo < hi and len(words[lo]) == depth)
+            index = lo + self.terminal[-1]
+            while index < hi:
+                char = words[index][depth]
+                end = index + 1
+                while end < hi and words[end][depth] == char:
+                    end += 1
+                labels.append(char)
+                self.targets.append(len(queue))
+                queue.append((index, end, depth + 1))
+                index = end
+        self.first.append(len(labels))
+        self.labels = "".join(labels)
+
+    def prefix_ends(self, text: str, start: int):
+        """
+        Yields every end such that text[start:end] is a word of the trie.
+        """
+        labels, targets, first, terminal = self.labels, self.targets, self.first, self.terminal
+        node = 0
+        for position in range(start, len(text)):
+            edge = labels.find(text[position], first[node], first[node + 1])
+            if edge < 0:
+                return
+            node = targets[edge]
+            if terminal[node]:
+                yield position + 1
+
+    def __len__(self):
+        return len(self.terminal)
+
+
+def load_clean_words() -> list:
+    """
+    Reads the clean dictionary plus the clean words of model2.py's dataset.
+    """
+    from model2 import data
+    words = [word for word, severity in data if severity == 0]
+    try:
+        with open(CLEAN_DICTIONARY_PATH, encoding="utf-8", errors="ignore") as dictionary:
+            words.extend(line.strip() for line in dictionary)
+    except OSError as e:
+        print(f"Error reading clean dictionary {CLEAN_DICTIONARY_PATH}: {e}; using the english-words list")
+        try:
+            from english_words import get_english_words_set
+            words.extend(get_english_words_set(["web2"], lower=True, alpha=True))
+        except ImportError:
+            print("english-words is not installed; only the dataset's clean words will count as words")
+    words = (word.lower() for word in words)
+    return [word for word in words if word.isalpha() and word.isascii()
+            and (len(word) >= MIN_WORD_LENGTH or word in SHORT_WORDS)] + list(SHORT_WORDS)
+
+
+def get_clean_dictionary() -> CompactTrie:
+    global clean_dictionary
+    if clean_dictionary is None:
+        clean_dictionary = CompactTrie(load_clean_words())
+    return clean_dictionary
+
+
+def find_concatenated(token: str, children: list, banned_words: frozenset, allowed_words: frozenset = frozenset()):
+    """
+    Splits a token into clean dictionary words and banned words with dynamic
+    programming over both tries, using as few banned words as possible.
+    Allowed words, which share the banned-word trie, count as clean; a
+    dictionary word made of a banned word plus an inflection does not. No word
+    boundary may fall inside a banned word unless another banned word starts
+    or ends there, so rare dictionary words cannot hide one
+    ("you|are|an|as|shole").
+    Returns CLEAN when the token is made of clean words only ("glass",
+    "classicassassin"), the first banned word of the best split otherwise, or
+    None when the token cannot be split. Costs the token length times the
+    longest word walked from each position.
+    """
+    length = len(token)
+    # Banned and allowed words starting at each position, read off the banned-word trie
+    banned_ends = [[] for _ in range(length)]
+    allowed_ends = [[] for _ in range(length)]
+    for start in range(length):
+        node = 0
+        for position in range(start, length):
+            node = children[node].get(token[position])
+            if node is None:
+                break
+            if token[start:position + 1] in banned_words:
+                banned_ends[start].append(position + 1)
+            elif token[start:position + 1] in allowed_words:
+                allowed_ends[start].append(position + 1)
+
+    # Positions strictly inside a banned word, where no split may fall, unless another
+    # banned word starts or ends there ("go|fuck|yourself" with both "fuck" and "fuckyou")
+    inside_banned = bytearray(length + 1)
+    banned_boundary = bytearray(length + 1)
+    for start, ends in enumerate(banned_ends):
+        for end in ends:
+            inside_banned[start + 1:end] = b"\x01" * (end - start - 1)
+            banned_boundary[start] = banned_boundary[end] = 1
+    for position in range(length + 1):
+        if banned_boundary[position]:
+            inside_banned[position] = 0
+
+    dictionary = get_clean_dictionary()
+    # Fewest banned words needed to split token[:i], and the first banned word of that split
+    banned_counts = [None] * (length + 1)
+    first_banned = [None] * (length + 1)
+    banned_counts[0] = 0
+    for start in range(length):
+        count = banned_counts[start]
+        if count is None:
+            continue
+        for end in itertools.chain(dictionary.prefix_ends(token, start), allowed_ends[start]):
+            if (inside_banned[end] or token[start:end] in banned_words
+                    or is_inflection(token, start, end, banned_ends[start])):
+                continue
+            if banned_counts[end] is None or count < banned_counts[end]:
+                banned_counts[end] = count
+                first_banned[end] = first_banned[start]
+        for end in banned_ends[start]:
+            if inside_banned[end]:
+                continue
+            if banned_counts[end] is None or count + 1 < banned_counts[end]:
+                banned_counts[end] = count + 1
+                first_banned[end] = first_banned[start] or token[start:end]
+
+    if banned_counts[length] is None:
+        return None
+    if banned_counts[length] == 0:
+        return CLEAN
+    return first_banned[length]
+
+
+def is_inflection(token: str, start: int, end: int, banned_ends: list) -> bool:
+    """
+    Whether token[start:end] is a banned word starting at start plus an
+    inflection, possibly after a doubled last letter ("shitty").
+    """
+    for banned_end in banned_ends:
+        if banned_end < end:
+            ending = token[banned_end:end]
+            if ending in INFLECTIONS or (ending[0] == token[banned_end - 1] and ending[1:] in INFLECTIONS):
+                return True
+    return False
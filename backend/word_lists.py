@@ -0,0 +1,366 @@
+import itertools
+import os
+from cache import token_verdicts, TOKEN_ENTRY_BYTES
+from matcher import BannedWordMatcher
+from fuzzy_index import FuzzyIndex, TrieFuzzyIndex
+from leet_lattice import LeetTrie, needs_lattice
+from word_break import find_concatenated, CLEAN
+from phrase_index import PhraseIndex
+from pattern_rules import PatternRules
+from model2 import normalize_many
+
+# Fuzzy engine for this deployment: "index" (BK-tree) or "trie" (bounded Levenshtein trie walk)
+FUZZY_ENGINE = os.getenv("FUZZY_ENGINE", "index")
+FUZZY_MAX_EDITS = int(os.getenv("FUZZY_MAX_EDITS", "2"))
+
+# Shortest token checked for banned words glued to ordinary words ("youareanasshole");
+# shorter tokens are only checked for being ordinary words
+CONCATENATED_TOKEN_LENGTH = int(os.getenv("CONCATENATED_TOKEN_LENGTH", "6"))
+
+# Identifies one compiled list, so cached verdicts never outlive the words they were computed from
+compile_ids = itertools.count(1)
+MISSING = object()
+LATTICE = "lattice"  # Marks lattice verdicts, which are keyed by raw token, in the verdict cache
+GLUED = "glued"  # Marks glued-word verdicts computed on their own, in the verdict cache
+
+# Measured: the automaton plus fuzzy indexes take roughly 430 bytes per character of word list
+BYTES_PER_CHAR = 430
+
+
+def make_fuzzy_index(words, ratio_threshold: int = 85, partial_threshold: int = 90) -> FuzzyIndex:
+    """
+    Builds the fuzzy index for the engine selected for this deployment.
+    """
+    if FUZZY_ENGINE == "trie":
+        return TrieFuzzyIndex(words, ratio_threshold, partial_threshold, FUZZY_MAX_EDITS)
+    return FuzzyIndex(words, ratio_threshold, partial_threshold)
+
+
+def normalized_words(words) -> frozenset:
+    """
+    Normalizes list entries the way message tokens are, so entries written
+    with leetspeak, separators or stretched letters ("b00bs", "a_s_s",
+    "assshole") can match a token exactly.
+    """
+    return frozenset(word.lower() for word in normalize_many([word for word in words if word]) if word)
+
+
+def phrase_tokens(phrases: list) -> dict:
+    """
+    Splits and normalizes multi-word phrases the way message tokens are.
+    Returns {tuple of normalized tokens: phrase}.
+    """
+    tokenized = {}
+    for phrase in phrases:
+        tokens = tuple(token.lower() for token in normalize_many(phrase.split()) if token)
+        if len(tokens) > 1:
+            tokenized.setdefault(tokens, phrase)
+    return tokenized
+
+
+def covered(start: int, end: int, spans: list) -> bool:
+    """
+    Whether some (start, end) span contains start..end.
+    """
+    return any(span_start <= start and end <= span_end for span_start, span_end in spans)
+
+
+class CompiledWordList:
+    """
+    Everything needed to match one banned word list, compiled once:
+    the normalized words, the allowed words, the exact-match automaton over
+    both, the leetspeak lattice trie, the fuzzy index, the index of
+    multi-word phrases, the pattern rules and the thresholds it was built with.
+    """
+
+    def __init__(self, words, allowed_words=(), patterns=(), ratio_threshold: int = 85, partial_threshold: int = 90):
+        # The lists as given, to tell whether a cached compilation is still current
+        self.source = (words, allowed_words, patterns)
+        # A word on both lists is allowed
+        self.allowed_words = normalized_words(allowed_words)
+        words = frozenset(word.lower() for word in words if word) - self.allowed_words
+        # Phrases can never match a single token, so they only go into the phrase index
+        phrases = sorted(word for word in words if len(word.split()) > 1)
+        self.words = normalized_words(words - frozenset(phrases)) - self.allowed_words
+        self.phrase_index = PhraseIndex(phrase_tokens(phrases))
+        self.pattern_rules = PatternRules(patterns)
+        self.ratio_threshold = ratio_threshold
+        self.partial_threshold = partial_threshold
+        self.matcher = BannedWordMatcher(sorted(self.words | self.allowed_words))
+        self.leet_trie = LeetTrie(self.matcher, self.words)
+        self.fuzzy_index = make_fuzzy_index(self.words, ratio_threshold, partial_threshold)
+        self.size = (1024 + BYTES_PER_CHAR * sum(len(word) for word in words | self.allowed_words)
+                     + BYTES_PER_CHAR * sum(len(pattern) for pattern in self.pattern_rules.patterns))
+        self.compile_id = next(compile_ids)
+
+    def find_all(self, text: str) -> list:
+        """
+        Banned words found in text by one automaton pass, except the ones inside
+        an allowed word: where an allowed span covers a banned one, the allowed span wins.
+        Returns (start, end, banned word).
+        """
+        matches = self.matcher.find_all(text)
+        if not self.allowed_words:
+            return matches
+        allowed_spans = [(start, end) for start, end, word in matches if word in self.allowed_words]
+        return [(start, end, word) for start, end, word in matches
+                if word in self.words
+                and not covered(start, end, allowed_spans)]
+
+    def find_allowed(self, text: str) -> list:
+        """
+        Returns (start, end) for every allowed word found in text.
+        """
+        if not self.allowed_words:
+            return []
+        return [(start, end) for start, end, word in self.matcher.find_all(text) if word in self.allowed_words]
+
+    def find_exact_matches(self, normalized_tokens: list) -> dict:
+        """
+        Runs the automaton once over the normalized tokens of a message. A token is
+        an exact match when a banned word covers the whole token.
+        Returns {token index: banned word}.
+        """
+        if not self.words:
+            return {}
+        token_starts = {}
+        position = 0
+        for index, normalized_word in enumerate(normalized_tokens):
+            token_starts[position] = (index, position + len(normalized_word))
+            position += len(normalized_word) + 1
+
+        exact_matches = {}
+        for start, end, banned_word in self.find_all(" ".join(normalized_tokens)):
+            index, token_end = token_starts.get(start, (None, None))
+            if index is not None and end == token_end:
+                exact_matches[index] = banned_word
+        return exact_matches
+
+    def find_concatenated_match(self, token: str):
+        """
+        Returns CLEAN for a token made of ordinary words, the banned word glued
+        inside a long token of ordinary words, or None.
+        """
+        split = find_concatenated(token, self.matcher.goto, self.words, self.allowed_words)
+        if split is not CLEAN and len(token) < CONCATENATED_TOKEN_LENGTH:
+            return None
+        return split
+
+    def find_spanning_matches(self, pieces: list) -> list:
+        """
+        Runs the automaton once over pieces joined with nothing in between,
+        e.g. the letters of "f u c k". A match counts when it starts and ends
+        on piece boundaries and spans at least two pieces.
+        Returns (first piece index, last piece index + 1, banned word).
+        """
+        if not self.words:
+            return []
+        piece_starts, piece_ends = {}, {}
+        position = 0
+        for index, piece in enumerate(pieces):
+            piece_starts[position] = index
+            position += len(piece)
+            piece_ends[position] = index + 1
+
+        matches = []
+        for start, end, banned_word in self.find_all("".join(pieces)):
+            first, last = piece_starts.get(start), piece_ends.get(end)
+            if first is not None and last is not None and last - first >= 2:
+                matches.append((first, last, banned_word))
+        return matches
+
+    def find_phrases(self, normalized_tokens: list) -> list:
+        """
+        Returns (first token index, last token index + 1, phrase) for the banned
+        phrases in a message's normalized word tokens.
+        """
+        return self.phrase_index.find_all(normalized_tokens)
+
+    def match_tokens(self, tokens: list) -> list:
+        """
+        Returns (banned_word, score, exact, glued) or None for each normalized
+        token; glued verdicts are banned words glued to ordinary words, which
+        callers score by the banned word rather than the token. Tokens made of
+        ordinary words are clean and skip the fuzzy index. Verdicts are
+        memoized per compiled list, so repeated tokens cost one cache lookup;
+        only the misses go through the automaton, the word-break check and the
+        fuzzy index.
+        """
+        results = [None] * len(tokens)
+        if not self.words:
+            return results
+
+        misses = {}
+        for index, token in enumerate(tokens):
+            verdict = token_verdicts.get((self.compile_id, token), MISSING)
+            if verdict is MISSING:
+                misses.setdefault(token, []).append(index)
+            else:
+                results[index] = verdict
+        if not misses:
+            return results
+
+        # Allowed tokens skip the word-break check and the fuzzy index
+        missed_tokens = [token for token in misses if token not in self.allowed_words]
+        verdicts = dict.fromkeys(misses)
+        for index, banned_word in self.find_exact_matches(missed_tokens).items():
+            verdicts[missed_tokens[index]] = (banned_word, 100, True, False)
+        clean = set()
+        for token in missed_tokens:
+            if verdicts[token] is None:
+                split = self.find_concatenated_match(token)
+                if split is CLEAN:
+                    clean.add(token)
+                elif split is not None:
+                    verdicts[token] = (split, 100, False, True)
+        fuzzy_tokens = [token for token in missed_tokens if verdicts[token] is None and token not in clean]
+        for token, match in zip(fuzzy_tokens, self.fuzzy_index.best_matches(fuzzy_tokens)):
+            if match is not None:
+                verdicts[token] = (match[0], match[1], False, False)
+
+        for token, verdict in verdicts.items():
+            token_verdicts.put((self.compile_id, token), verdict, TOKEN_ENTRY_BYTES + 2 * len(token))
+            for index in misses[token]:
+                results[index] = verdict
+        return results
+
+    def match_glued(self, tokens: list) -> list:
+        """
+        Returns (banned_word, 100, False, True) or None for each normalized
+        token: only the word-break check, for tokens that are not matched
+        otherwise. Verdicts are memoized like match_tokens.
+        """
+        results = [None] * len(tokens)
+        if not self.words:
+            return results
+        for index, token in enumerate(tokens):
+            if len(token) < CONCATENATED_TOKEN_LENGTH or token in self.allowed_words:
+                continue
+            verdict = token_verdicts.get((self.compile_id, GLUED, token), MISSING)
+            if verdict is MISSING:
+                split = self.find_concatenated_match(token)
+                verdict = (split, 100, False, True) if split is not None and split is not CLEAN else None
+                token_verdicts.put((self.compile_id, GLUED, token), verdict, TOKEN_ENTRY_BYTES + 2 * len(token))
+            results[index] = verdict
+        return results
+
+    def match_readings(self, raw_tokens: list) -> list:
+        """
+        Returns (banned_word, 100, True, False) or None for each raw token: an exact
+        match of any leetspeak reading of the whole token. Only tokens with
+        ambiguous characters are walked; verdicts are memoized like match_tokens.
+        """
+        results = [None] * len(raw_tokens)
+        if not self.words:
+            return results
+        for index, token in enumerate(raw_tokens):
+            if not needs_lattice(token):
+                continue
+            verdict = token_verdicts.get((self.compile_id, LATTICE, token), MISSING)
+            if verdict is MISSING:
+                banned_word = self.leet_trie.match(token)
+                verdict = (banned_word, 100, True, False) if banned_word is not None else None
+                token_verdicts.put((self.compile_id, LATTICE, token), verdict, TOKEN_ENTRY_BYTES + 2 * len(token))
+            results[index] = verdict
+        return results
+
+
+class TenantWordLists:
+    """
+    The compiled global list shared by every company plus one company's
+    compiled custom list, matched together as a single banned word list.
+    """
+
+    def __init__(self, global_list: CompiledWordList, custom_list: CompiledWordList):
+        self.lists = (global_list, custom_list)
+
+    def allowed_tokens(self, tokens) -> set:
+        """
+        The normalized tokens on either allowlist. The company's allowlist also
+        clears global banned words, and the global allowlist custom ones.
+        """
+        return {token for token in tokens if any(token in word_list.allowed_words for word_list in self.lists)}
+
+    def match_tokens(self, tokens: list) -> list:
+        """
+        Best verdict per token across both lists: exact matches first, then the highest score.
+        Tokens on either allowlist get no verdict.
+        """
+        allowed = self.allowed_tokens(tokens)
+        checked = [token for token in tokens if token not in allowed]
+        verdicts = dict(zip(checked, self._best([word_list.match_tokens(checked) for word_list in self.lists])))
+        return [self._unless_allowed(token, verdicts.get(token)) for token in tokens]
+
+    def match_glued(self, tokens: list) -> list:
+        """
+        Glued-word verdict per normalized token across both lists; tokens on
+        either allowlist get no verdict.
+        """
+        allowed = self.allowed_tokens(tokens)
+        checked = [token for token in tokens if token not in allowed]
+        verdicts = dict(zip(checked, self._best([word_list.match_glued(checked) for word_list in self.lists])))
+        return [self._unless_allowed(token, verdicts.get(token)) for token in tokens]
+
+    def match_readings(self, raw_tokens: list) -> list:
+        """
+        Lattice verdict per raw token across both lists.
+        """
+        return self._best([word_list.match_readings(raw_tokens) for word_list in self.lists])
+
+    def find_spanning_matches(self, pieces: list) -> list:
+        """
+        Matches spanning several pieces in either list, except the ones inside
+        an allowed word of either list.
+        """
+        matches = list(dict.fromkeys(match for word_list in self.lists for match in word_list.find_spanning_matches(pieces)))
+        if not matches:
+            return matches
+        piece_starts = list(itertools.accumulate((len(piece) for piece in pieces), initial=0))
+        allowed_spans = self.find_allowed("".join(pieces))
+        return [(first, last, banned_word) for first, last, banned_word in matches
+                if not covered(piece_starts[first], piece_starts[last], allowed_spans)]
+
+    def find_allowed(self, text: str) -> list:
+        """
+        (start, end) of the words of either allowlist found in text.
+        """
+        return [span for word_list in self.lists for span in word_list.find_allowed(text)]
+
+    def find_phrases(self, normalized_tokens: list) -> list:
+        """
+        Phrases found in either list.
+        """
+        return list(dict.fromkeys(match for word_list in self.lists for match in word_list.find_phrases(normalized_tokens)))
+
+    def find_patterns(self, text: str) -> list:
+        """
+        Pattern rule matches in a whole message, (start, end, pattern).
+        """
+        return [match for word_list in self.lists for match in word_list.pattern_rules.find_all(text)]
+
+    def _unless_allowed(self, token: str, verdict):
+        """
+        Drops a glued or fuzzy verdict whose banned word only appears inside
+        allowed words of either list ("welcometoscunthorpe" with "scunthorpe"
+        on the company's allowlist and "cunt" on the global list): each list
+        only clears its own matches, so the allowed span has to win here.
+        """
+        if verdict is None or verdict[2] or verdict[0] not in token:
+            return verdict
+        allowed_spans = self.find_allowed(token)
+        length = len(verdict[0])
+        starts = [start for start in range(len(token) - length + 1) if token.startswith(verdict[0], start)]
+        if all(covered(start, start + length, allowed_spans) for start in starts):
+            return None
+        return verdict
+
+    @staticmethod
+    def _best(verdict_lists: list) -> list:
+        best = [None] * len(verdict_lists[0])
+        for verdicts in verdict_lists:
+            for index, verdict in enumerate(verdicts):
+                if verdict is None:
+                    continue
+                if best[index] is None or (verdict[2], verdict[1]) > (best[index][2], best[index][1]):
+                    best[index] = verdict
+        return best